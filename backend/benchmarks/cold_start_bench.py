@@ -0,0 +1,87 @@
+"""Measure cold-start time of the API process.
+
+Each run starts a fresh interpreter and times ``import main`` (what a new
+worker pays before it can serve); with ``--lifespan`` it also runs the
+startup hook, which needs MongoDB and Stockfish. ``--importtime`` lists
+the slowest imports of one run.
+
+Run from the backend directory:
+
+    python -m benchmarks.cold_start_bench --runs 5 --target-ms 1500
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+IMPORT_SNIPPET = """
+import time
+started = time.perf_counter()
+import main
+print(f"imports {(time.perf_counter() - started) * 1000:.1f}")
+"""
+
+LIFESPAN_SNIPPET = IMPORT_SNIPPET + """
+import asyncio
+from services.startup_report import startup_report
+
+async def run():
+    async with main.app.router.lifespan_context(main.app):
+        pass
+
+asyncio.run(run())
+for name, ms in startup_report.phases.items():
+    if name != "imports":
+        print(f"{name} {ms}")
+"""
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_once(snippet: str):
+    output = subprocess.run(
+        [sys.executable, "-c", snippet], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    phases = {}
+    for line in output.splitlines():
+        match = re.fullmatch(r"(\w+) ([\d.]+)", line.strip())
+        if match:
+            phases[match.group(1)] = float(match.group(2))
+    return phases
+
+def slowest_imports(count: int):
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    for cumulative, module in sorted(rows, reverse=True)[:count]:
+        print(f"  {cumulative / 1000:>8.1f} ms  {module}")
+
+def main(runs: int, lifespan: bool, target_ms: float, importtime: bool):
+    samples = [run_once(LIFESPAN_SNIPPET if lifespan else IMPORT_SNIPPET) for _ in range(runs)]
+    for phase in samples[0]:
+        values = [sample[phase] for sample in samples]
+        print(f"{phase:<20} median {statistics.median(values):>8.1f} ms  min {min(values):>8.1f} ms")
+
+    total = statistics.median(sum(sample.values()) for sample in samples)
+    print(f"{'cold start':<20} median {total:>8.1f} ms (target {target_ms:.0f} ms)")
+    if importtime:
+        print("Slowest imports (cumulative):")
+        slowest_imports(15)
+    if total > target_ms:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start time of the API process")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--lifespan", action="store_true", help="Also run the startup hook")
+    parser.add_argument("--target-ms", type=float, default=1500)
+    parser.add_argument("--importtime", action="store_true", help="List the slowest imports")
+    args = parser.parse_args()
+    main(args.runs, args.lifespan, args.target_ms, args.importtime)
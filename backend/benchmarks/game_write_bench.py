@@ -0,0 +1,69 @@
+"""Compare bytes written per move: full-document $set vs append-only $push.
+
+Run from the backend directory:
+
+    python -m benchmarks.game_write_bench --plies 120
+"""
+import argparse
+import random
+from datetime import datetime
+
+import bson
+import chess
+
+from database.game_codec import build_ply_update
+from database.models import Game, GameType
+
+EXPLANATION = "The move develops a piece, controls the centre and prepares castling. " * 8
+
+def fake_analysis(new_fen: str, move: str) -> dict:
+    return {
+        "valid": True,
+        "correct": False,
+        "new_fen": new_fen,
+        "explanation": EXPLANATION,
+        "improvement_suggestion": EXPLANATION,
+        "best_move": move,
+        "centipawn_loss": 35,
+        "tutor_action": 2,
+        "evaluation": {"score_cp": 20, "score_mate": None, "best_move": None, "depth": 15}
+    }
+
+def run(plies: int, seed: int):
+    random.seed(seed)
+    board = chess.Board()
+    game = Game(
+        game_id="game_bench", user_id="user_bench", game_type=GameType.PRACTICE,
+        white_player="user", black_player="user",
+        positions=[board.fen()], moves=[], analysis=[], started_at=datetime.now()
+    )
+
+    print(f"{'ply':>5} {'full $set bytes':>16} {'$push bytes':>12}")
+    full_total = delta_total = 0
+    for ply in range(plies):
+        if board.is_game_over():
+            board = chess.Board()
+        move = random.choice(list(board.legal_moves))
+        board.push(move)
+        analysis = fake_analysis(board.fen(), move.uci())
+
+        game.moves.append(move.uci())
+        game.positions.append(board.fen())
+        game.analysis.append(analysis)
+
+        full = len(bson.encode({"$set": game.dict()}))
+        delta = len(bson.encode(build_ply_update(ply, [move.uci()], [board.fen()], [analysis])))
+        full_total += full
+        delta_total += delta
+        if ply % 10 == 0 or ply == plies - 1:
+            print(f"{ply + 1:>5} {full:>16} {delta:>12}")
+
+    print(f"\nTotal over {plies} plies: full $set {full_total} bytes, $push {delta_total} bytes "
+          f"({full_total / delta_total:.1f}x less written)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plies", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    run(args.plies, args.seed)
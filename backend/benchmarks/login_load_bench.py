@@ -0,0 +1,60 @@
+"""Measure event-loop stalls caused by concurrent logins.
+
+A probe coroutine stands in for move requests: it wakes every few
+milliseconds and records how late it was. Meanwhile a burst of password
+checks runs either inline on the event loop or on the bcrypt pool.
+
+Run from the backend directory:
+
+    python -m benchmarks.login_load_bench --logins 32 --rounds 12
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from services.auth_service import auth_service
+
+PROBE_INTERVAL = 0.005
+
+async def probe(stop: asyncio.Event, delays: list):
+    while not stop.is_set():
+        scheduled = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        delays.append((time.perf_counter() - scheduled - PROBE_INTERVAL) * 1000)
+
+async def inline_login(password: str, hashed: str):
+    # What the handlers did before: bcrypt on the event loop thread
+    return auth_service._verify_password(password, hashed)
+
+async def run_mode(name: str, login, logins: int, password: str, hashed: str):
+    stop = asyncio.Event()
+    delays = []
+    prober = asyncio.create_task(probe(stop, delays))
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login(password, hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await prober
+    delays.sort()
+    p99 = delays[int(len(delays) * 0.99) - 1] if len(delays) > 1 else delays[0]
+    print(f"{name:>7}: {logins} logins in {elapsed:.2f}s | move-probe delay "
+          f"median {statistics.median(delays):.1f} ms, p99 {p99:.1f} ms, max {delays[-1]:.1f} ms")
+
+async def main(logins: int, rounds: int):
+    auth_service.bcrypt_rounds = rounds
+    password = "correct horse battery staple"
+    hashed = auth_service._hash_password(password)
+
+    await run_mode("inline", inline_login, logins, password, hashed)
+    await run_mode("pool", auth_service.verify_password, logins, password, hashed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent logins vs event-loop latency")
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.rounds))
@@ -1,54 +1,198 @@
-from functools import lru_cache
 import redis
+import asyncio
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from dotenv import load_dotenv
 import json
 
 load_dotenv()
 
+# Bump to invalidate every content-addressed key at once (e.g. on a serialization change)
+KEY_SCHEMA_VERSION = "v1"
+
+class TTLCache:
+    """Bounded in-process LRU cache with per-entry expiry and byte accounting"""
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (expires_at, size, value)
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self.bytes_used -= size
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key, value, expire_seconds=3600):
+        size = len(json.dumps(value).encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic() + expire_seconds, size, value)
+            self.bytes_used += size
+            while len(self._data) > self.max_entries or self.bytes_used > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes_used = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes_used,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
 class CacheManager:
     def __init__(self):
         self.redis_client = None
         self.use_redis = os.getenv("USE_REDIS", "false").lower() == "true"
-        
-        if self.use_redis:
+        self.local = TTLCache(
+            max_entries=int(os.getenv("CACHE_MAX_ENTRIES", 1000)),
+            max_bytes=int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 * 1024))
+        )
+        # Cap on how long an L1 copy of a Redis entry may be served locally
+        self.l1_ttl = int(os.getenv("CACHE_L1_TTL", 300))
+        self._redis_checked = False
+        # Own small pool for Redis round trips, so a slow Redis can't tie up engine work
+        self._io = ThreadPoolExecutor(
+            max_workers=int(os.getenv("REDIS_IO_WORKERS", 4)), thread_name_prefix="redis"
+        )
+
+    def _redis(self):
+        """Redis client, connected on first use so importing this module never blocks"""
+        if self.use_redis and not self._redis_checked:
+            self._redis_checked = True
             try:
                 self.redis_client = redis.Redis(
                     host=os.getenv("REDIS_HOST", "localhost"),
                     port=int(os.getenv("REDIS_PORT", 6379)),
                     db=0,
-                    decode_responses=True
+                    decode_responses=True,
+                    # Bounded so a slow Redis degrades to a cache miss instead of hanging a worker
+                    socket_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.5)),
+                    socket_connect_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.5))
                 )
                 self.redis_client.ping()
                 print("Redis cache enabled")
             except Exception as e:
-                print(f"Redis connection failed, falling back to LRU cache: {e}")
+                print(f"Redis connection failed, falling back to in-memory cache: {e}")
+                self.redis_client = None
                 self.use_redis = False
-    
-    @lru_cache(maxsize=1000)
-    def get_cached_lru(self, key):
-        # This will be used if Redis is not available
-        return None
-    
-    def set_cached_lru(self, key, value):
-        # LRU cache is handled automatically by the decorator
-        pass
-    
+        return self.redis_client
+
     def get(self, key):
-        if self.use_redis and self.redis_client:
-            cached = self.redis_client.get(key)
-            return json.loads(cached) if cached else None
-        else:
-            return self.get_cached_lru(key)
-    
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        return self._get_remote(key)
+
+    def _get_remote(self, key):
+        redis_client = self._redis()
+        if redis_client is None:
+            return None
+
+        cached = None
+        # Kept if the TTL lookup fails after the get succeeded
+        ttl = self.l1_ttl
+        try:
+            cached = redis_client.get(key)
+            if cached:
+                ttl = redis_client.ttl(key)
+        except redis.RedisError as e:
+            print(f"Redis get failed: {e}")
+        if not cached:
+            return None
+
+        value = json.loads(cached)
+        # Read-through: keep a short-lived local copy, never outliving the Redis entry
+        self.local.set(key, value, min(self.l1_ttl, ttl) if ttl and ttl > 0 else self.l1_ttl)
+        return value
+
     def set(self, key, value, expire_seconds=3600):
-        if self.use_redis and self.redis_client:
-            self.redis_client.setex(key, expire_seconds, json.dumps(value))
+        redis_client = self._redis()
+        if redis_client is not None:
+            try:
+                redis_client.setex(key, expire_seconds, json.dumps(value))
+            except redis.RedisError as e:
+                print(f"Redis set failed: {e}")
+            self.local.set(key, value, min(self.l1_ttl, expire_seconds))
         else:
-            # For LRU cache, we can't set expiration, but the decorator handles size
-            self.set_cached_lru(key, value)
-    
+            self.local.set(key, value, expire_seconds)
+
+    # Async variants for request handlers: L1 hits stay on the loop, Redis calls
+    # (including the first connect) run on the Redis I/O pool
+    async def _offload(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._io, partial(func, *args))
+
+    async def aget(self, key):
+        value = self.local.get(key)
+        if value is not None or not self.use_redis:
+            return value
+        return await self._offload(self._get_remote, key)
+
+    async def aset(self, key, value, expire_seconds=3600):
+        if not self.use_redis:
+            self.local.set(key, value, expire_seconds)
+            return
+        await self._offload(self.set, key, value, expire_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "redis" if self.use_redis and self.redis_client else "memory",
+            "local": self.local.stats()
+        }
+
     def generate_cache_key(self, fen: str, prompt_type: str) -> str:
         return f"{prompt_type}:{fen}"
 
+    def generate_content_key(self, namespace: str, **fields) -> str:
+        """Deterministic key over the given fields, identical across processes and restarts"""
+        payload = json.dumps(fields, sort_keys=True, separators=(",", ":"), default=str)
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"{namespace}:{KEY_SCHEMA_VERSION}:{digest}"
+
 cache_manager = CacheManager()
@@ -0,0 +1,133 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+import chess
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class EvaluationCache:
+    """Two-tier cache of engine evaluations keyed by position and depth.
+
+    Positions are normalized to FEN without the move clocks, so the same
+    position reached by different move orders shares an entry. A result
+    searched to a greater depth satisfies any shallower request. Entries
+    live in an in-process LRU backed by SQLite, which survives restarts.
+    """
+
+    def __init__(self, path: str = None, max_entries: int = None):
+        self.path = path or os.getenv("EVAL_CACHE_PATH") or os.path.join(
+            os.path.dirname(__file__), "eval_cache.sqlite3"
+        )
+        self.max_entries = max_entries or int(os.getenv("EVAL_CACHE_SIZE", 10000))
+        self.enabled = os.getenv("EVAL_CACHE_ENABLED", "true").lower() == "true"
+
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def position_key(fen: str) -> str:
+        """FEN without halfmove/fullmove clocks and with en passant only when legal"""
+        return chess.Board(fen).epd()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None:
+            try:
+                self._conn = sqlite3.connect(self.path, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS evaluations ("
+                    "position TEXT PRIMARY KEY, depth INTEGER NOT NULL, result TEXT NOT NULL)"
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"Evaluation cache disk tier unavailable, using memory only: {e}")
+                self._conn = None
+        return self._conn
+
+    def _remember(self, key: str, depth: int, result: Dict[str, Any]):
+        self._lru[key] = (depth, result)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def get(self, fen: str, depth: int) -> Optional[Dict[str, Any]]:
+        """Return a cached evaluation searched to at least ``depth``"""
+        if not self.enabled:
+            return None
+        key = self.position_key(fen)
+
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry and entry[0] >= depth:
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+                return dict(entry[1])
+
+            conn = self._connect()
+            row = None
+            if conn is not None:
+                row = conn.execute(
+                    "SELECT depth, result FROM evaluations WHERE position = ?", (key,)
+                ).fetchone()
+
+            if row and row[0] >= depth:
+                result = json.loads(row[1])
+                self._remember(key, row[0], result)
+                self.disk_hits += 1
+                return dict(result)
+
+            self.misses += 1
+            return None
+
+    def set(self, fen: str, depth: int, result: Dict[str, Any]):
+        """Store an evaluation unless a deeper one is already cached"""
+        if not self.enabled or not result or "error" in result:
+            return
+        key = self.position_key(fen)
+
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry and entry[0] > depth:
+                return
+            self._remember(key, depth, result)
+
+            conn = self._connect()
+            if conn is not None:
+                conn.execute(
+                    "INSERT INTO evaluations (position, depth, result) VALUES (?, ?, ?) "
+                    "ON CONFLICT(position) DO UPDATE SET depth = excluded.depth, result = excluded.result "
+                    "WHERE excluded.depth >= evaluations.depth",
+                    (key, depth, json.dumps(result))
+                )
+                conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self._lru),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+eval_cache = EvaluationCache()
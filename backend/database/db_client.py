@@ -1,5 +1,6 @@
 import os
 from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo.errors import ConnectionFailure
 from dotenv import load_dotenv
 
@@ -11,6 +12,8 @@ class MongoDBClient:
         self.database_name = "chess_tutor"
         self.client = None
         self.db = None
+        self.async_client = None
+        self.async_db = None
         
     def connect(self):
         try:
@@ -23,14 +26,31 @@ class MongoDBClient:
             print(f"Failed to connect to MongoDB: {e}")
             raise
     
+    async def ping(self):
+        """Check the server is reachable through the async client, without blocking the loop"""
+        if self.async_client is None:
+            self.get_async_collection("users")
+        await self.async_client.admin.command('ping')
+        print("Successfully connected to MongoDB!")
+    
     def get_collection(self, collection_name):
-        if not self.db:
+        if self.db is None:
             self.connect()
         return self.db[collection_name]
     
+    def get_async_collection(self, collection_name):
+        """Motor collection for use from request handlers without blocking the event loop"""
+        if self.async_db is None:
+            # Motor connects lazily on the first operation, so this never blocks
+            self.async_client = AsyncIOMotorClient(self.connection_string)
+            self.async_db = self.async_client[self.database_name]
+        return self.async_db[collection_name]
+    
     def close(self):
         if self.client:
             self.client.close()
+        if self.async_client:
+            self.async_client.close()
 
 # Singleton instance
 db_client = MongoDBClient()
@@ -0,0 +1,111 @@
+"""Compact storage format for games.
+
+Stored games (``storage_version`` 2) keep only the move list plus a FEN
+checkpoint every ``checkpoint_interval`` plies (recorded per document, from
+``CHECKPOINT_INTERVAL`` when it was encoded); per-ply FENs (``positions``
+and each analysis entry's ``new_fen``) are rebuilt by replaying moves when
+a caller needs them, or from the nearest checkpoint for a single ply. Version 1 documents, which store every FEN, are still
+read as-is until migrated with ``python -m database.migrate_compact_games``.
+"""
+import os
+from typing import List, Dict, Optional
+
+import chess
+
+from database.models import Game
+
+STORAGE_VERSION = 2
+CHECKPOINT_INTERVAL = int(os.getenv("GAME_CHECKPOINT_INTERVAL", 20))
+# Interval of compact documents written before it was stored on each one
+DEFAULT_CHECKPOINT_INTERVAL = 20
+# Storage-only keys that are not part of the Game model
+HELPER_FIELDS = ("storage_version", "start_fen", "checkpoints", "checkpoint_interval")
+
+def compact_analysis(entry: Dict) -> Dict:
+    """Analysis entry without the FEN that is derivable from the move list"""
+    return {key: value for key, value in entry.items() if key != "new_fen"}
+
+def encode_game(game: Game) -> Dict:
+    doc = game.dict(exclude={"positions"})
+    doc["storage_version"] = STORAGE_VERSION
+    doc["start_fen"] = game.positions[0] if game.positions else chess.STARTING_FEN
+    doc["checkpoint_interval"] = CHECKPOINT_INTERVAL
+    doc["checkpoints"] = game.positions[CHECKPOINT_INTERVAL::CHECKPOINT_INTERVAL]
+    doc["analysis"] = [compact_analysis(entry) for entry in game.analysis]
+    return doc
+
+def checkpoint_interval(doc: Dict) -> int:
+    return doc.get("checkpoint_interval") or DEFAULT_CHECKPOINT_INTERVAL
+
+def replay_positions(start_fen: str, moves: List[str]) -> List[str]:
+    board = chess.Board(start_fen or chess.STARTING_FEN)
+    positions = [board.fen()]
+    for move in moves:
+        board.push_uci(move)
+        positions.append(board.fen())
+    return positions
+
+def restore_positions(game: Game, start_fen: str = None):
+    """Replay the moves to fill in ``positions`` and the analysis entries' ``new_fen``"""
+    start_fen = start_fen or (game.positions[0] if game.positions else chess.STARTING_FEN)
+    game.positions = replay_positions(start_fen, game.moves)
+    restore_analysis_fens(game)
+
+def restore_analysis_fens(game: Game):
+    for ply, entry in enumerate(game.analysis):
+        if "new_fen" not in entry and ply + 1 < len(game.positions):
+            entry["new_fen"] = game.positions[ply + 1]
+
+def decode_game(doc: Dict, with_positions: bool = True) -> Game:
+    """Build a Game in the API shape from either storage version
+
+    With ``with_positions=False`` a compact game only gets its start FEN in
+    ``positions``; callers that replay the moves anyway (live sessions) fill
+    in the rest themselves.
+    """
+    if doc.get("storage_version", 1) < STORAGE_VERSION:
+        return Game(**doc)
+
+    fields = {key: value for key, value in doc.items() if key not in HELPER_FIELDS}
+    fields["positions"] = [doc.get("start_fen") or chess.STARTING_FEN]
+    game = Game(**fields)
+    if with_positions:
+        restore_positions(game)
+    return game
+
+def position_at(doc: Dict, ply: int) -> str:
+    """FEN after ``ply`` plies, replaying from the nearest checkpoint only"""
+    if doc.get("storage_version", 1) < STORAGE_VERSION:
+        return doc["positions"][ply]
+
+    interval = checkpoint_interval(doc)
+    checkpoint = min(ply // interval, len(doc.get("checkpoints", [])))
+    if checkpoint:
+        board = chess.Board(doc["checkpoints"][checkpoint - 1])
+    else:
+        board = chess.Board(doc.get("start_fen") or chess.STARTING_FEN)
+    for move in doc["moves"][checkpoint * interval:ply]:
+        board.push_uci(move)
+    return board.fen()
+
+def build_ply_update(start_ply: int, moves: List[str], positions: List[str], analysis: List[Dict],
+                     result_fields: Optional[Dict] = None, include_analysis: bool = True) -> Dict:
+    """Append-only update carrying just the new plies, so write size doesn't grow with the game
+
+    ``positions[i]`` is the FEN after ply ``start_ply + i + 1``; only those
+    landing on a checkpoint boundary are stored. The document must use the
+    current ``CHECKPOINT_INTERVAL`` (see ``checkpoint_interval``).
+    """
+    checkpoints = [
+        fen for i, fen in enumerate(positions)
+        if (start_ply + i + 1) % CHECKPOINT_INTERVAL == 0
+    ]
+    push = {"moves": {"$each": moves}}
+    if checkpoints:
+        push["checkpoints"] = {"$each": checkpoints}
+    if include_analysis:
+        push["analysis"] = {"$each": [compact_analysis(entry) for entry in analysis]}
+    update = {"$push": push}
+    if result_fields:
+        update["$set"] = result_fields
+    return update
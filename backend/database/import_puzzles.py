@@ -0,0 +1,77 @@
+"""Load a Lichess-format puzzle CSV into the local puzzle store.
+
+Run from the backend directory (the Lichess dump is .zst; decompress it first):
+
+    python -m database.import_puzzles lichess_db_puzzle.csv --min-popularity 80
+"""
+import argparse
+import bz2
+import csv
+import gzip
+import time
+
+from database.puzzle_store import puzzle_store
+
+# Column order of the Lichess puzzle dump, for files without a header row
+LICHESS_COLUMNS = [
+    "PuzzleId", "FEN", "Moves", "Rating", "RatingDeviation", "Popularity",
+    "NbPlays", "Themes", "GameUrl", "OpeningTags"
+]
+
+def _open(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", newline="")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", newline="")
+    return open(path, newline="")
+
+def import_puzzles(path: str, batch_size: int = 5000, min_popularity: int = None,
+                   max_deviation: int = None, limit: int = None):
+    imported = 0
+    skipped = 0
+    started = time.perf_counter()
+
+    with _open(path) as f:
+        header = f.readline()
+        if header.startswith("PuzzleId"):
+            fieldnames = next(csv.reader([header]))
+        else:
+            f.seek(0)
+            fieldnames = LICHESS_COLUMNS
+        reader = csv.DictReader(f, fieldnames=fieldnames)
+
+        batch = []
+        for row in reader:
+            puzzle = puzzle_store.parse_lichess_row(row)
+            if (puzzle is None
+                    or (min_popularity is not None and puzzle["popularity"] < min_popularity)
+                    or (max_deviation is not None and puzzle["rating_deviation"] > max_deviation)):
+                skipped += 1
+                continue
+
+            batch.append(puzzle)
+            if len(batch) >= batch_size:
+                imported += puzzle_store.insert_many(batch)
+                batch = []
+            if limit and imported + len(batch) >= limit:
+                break
+
+        if batch:
+            imported += puzzle_store.insert_many(batch)
+
+    elapsed = time.perf_counter() - started
+    print(f"Imported {imported} puzzles ({skipped} skipped) in {elapsed:.1f}s; "
+          f"store now holds {puzzle_store.count()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a Lichess puzzle CSV")
+    parser.add_argument("path", help="CSV file, optionally .gz or .bz2 compressed")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--min-popularity", type=int, help="Skip puzzles voted below this (-100..100)")
+    parser.add_argument("--max-deviation", type=int, help="Skip puzzles with a less settled rating")
+    parser.add_argument("--limit", type=int, help="Stop after this many puzzles")
+    args = parser.parse_args()
+    try:
+        import_puzzles(args.path, args.batch_size, args.min_popularity, args.max_deviation, args.limit)
+    finally:
+        puzzle_store.close()
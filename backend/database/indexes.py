@@ -0,0 +1,137 @@
+"""Declarative MongoDB index registry.
+
+``apply_indexes`` runs at startup and is idempotent. From the backend
+directory the module also works as a maintenance tool:
+
+    python -m database.indexes --report        # missing / extra indexes
+    python -m database.indexes --apply         # create missing indexes
+    python -m database.indexes --check-plans   # flag COLLSCAN on known queries
+"""
+import argparse
+import asyncio
+from typing import Dict, List, Any
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from database.db_client import db_client
+
+class IndexSpec:
+    def __init__(self, name: str, keys: List[tuple], unique: bool = False):
+        self.name = name
+        self.keys = keys
+        self.unique = unique
+
+# Every index the app relies on, by collection
+INDEXES: Dict[str, List[IndexSpec]] = {
+    "users": [
+        IndexSpec("user_id_unique", [("user_id", ASCENDING)], unique=True),
+        IndexSpec("email_unique", [("email", ASCENDING)], unique=True),
+        IndexSpec("username_unique", [("username", ASCENDING)], unique=True),
+    ],
+    "games": [
+        IndexSpec("game_id_unique", [("game_id", ASCENDING)], unique=True),
+        IndexSpec("user_history", [("user_id", ASCENDING), ("started_at", DESCENDING), ("game_id", DESCENDING)]),
+    ],
+    "game_analysis": [
+        IndexSpec("game_ply_unique", [("game_id", ASCENDING), ("ply", ASCENDING)], unique=True),
+    ],
+    "feedback": [
+        IndexSpec("user_recent", [("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "learner_state": [
+        IndexSpec("user_id_unique", [("user_id", ASCENDING)], unique=True),
+    ],
+}
+
+# Representative queries issued by the app: (collection, filter, sort)
+KNOWN_QUERIES = [
+    ("users", {"email": "someone@example.com"}, None),
+    ("users", {"username": "someone"}, None),
+    ("users", {"user_id": "user_0"}, None),
+    ("games", {"game_id": "game_0"}, None),
+    ("games", {"user_id": "user_0"}, [("started_at", DESCENDING), ("game_id", DESCENDING)]),
+    ("game_analysis", {"game_id": "game_0"}, [("ply", ASCENDING)]),
+    ("feedback", {"user_id": "user_0"}, [("created_at", DESCENDING)]),
+    ("learner_state", {"user_id": "user_0"}, None),
+]
+
+async def apply_indexes(registry: Dict[str, List[IndexSpec]] = None) -> Dict[str, Any]:
+    """Create any registered index that doesn't exist yet and return the resulting report"""
+    registry = registry or INDEXES
+    for collection_name, specs in registry.items():
+        collection = db_client.get_async_collection(collection_name)
+        for spec in specs:
+            try:
+                await collection.create_index(spec.keys, name=spec.name, unique=spec.unique)
+            except OperationFailure as e:
+                # e.g. duplicate values blocking a unique index, or a same-named index with other options
+                print(f"Could not create index {collection_name}.{spec.name}: {e}")
+    return await index_report(registry)
+
+async def index_report(registry: Dict[str, List[IndexSpec]] = None) -> Dict[str, Any]:
+    registry = registry or INDEXES
+    report = {}
+    for collection_name, specs in registry.items():
+        existing = await db_client.get_async_collection(collection_name).index_information()
+        existing.pop("_id_", None)
+        expected = {spec.name for spec in specs}
+        report[collection_name] = {
+            "missing": sorted(expected - set(existing)),
+            "extra": sorted(set(existing) - expected)
+        }
+    return report
+
+def _plan_stages(plan: Dict[str, Any]):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+def check_query_plans() -> List[Dict[str, Any]]:
+    """Explain each known query and flag the ones whose winning plan scans the collection"""
+    results = []
+    for collection_name, query, sort in KNOWN_QUERIES:
+        cursor = db_client.get_collection(collection_name).find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        stages = [stage for stage in _plan_stages(plan) if stage]
+        results.append({
+            "collection": collection_name,
+            "query": query,
+            "sort": sort,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages
+        })
+    return results
+
+def _print_report(report: Dict[str, Any]):
+    for collection_name, diff in report.items():
+        print(f"{collection_name}: missing={diff['missing']} extra={diff['extra']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the app's MongoDB indexes")
+    parser.add_argument("--apply", action="store_true", help="Create missing indexes")
+    parser.add_argument("--report", action="store_true", help="List missing and extra indexes")
+    parser.add_argument("--check-plans", action="store_true", help="Flag known queries that COLLSCAN")
+    args = parser.parse_args()
+
+    try:
+        if args.apply:
+            _print_report(asyncio.run(apply_indexes()))
+        elif args.report or not args.check_plans:
+            _print_report(asyncio.run(index_report()))
+        if args.check_plans:
+            flagged = 0
+            for result in check_query_plans():
+                marker = "COLLSCAN" if result["collscan"] else "ok"
+                flagged += result["collscan"]
+                print(f"[{marker}] {result['collection']} {result['query']} sort={result['sort']} "
+                      f"-> {' > '.join(result['stages'])}")
+            if flagged:
+                raise SystemExit(1)
+    finally:
+        db_client.close()
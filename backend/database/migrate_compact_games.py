@@ -0,0 +1,63 @@
+"""Rewrite stored games into the compact (moves + checkpoints) format.
+
+Run from the backend directory:
+
+    python -m database.migrate_compact_games --dry-run
+    python -m database.migrate_compact_games --batch-size 500
+"""
+import argparse
+
+import bson
+from pymongo import ReplaceOne
+
+from database.db_client import db_client
+from database.game_codec import STORAGE_VERSION, decode_game, encode_game
+
+def migrate(batch_size: int = 500, dry_run: bool = False):
+    collection = db_client.get_collection("games")
+    query = {"$or": [
+        {"storage_version": {"$exists": False}},
+        {"storage_version": {"$lt": STORAGE_VERSION}}
+    ]}
+
+    migrated = 0
+    bytes_before = 0
+    bytes_after = 0
+    batch = []
+
+    for doc in collection.find(query):
+        game = decode_game(doc)
+        compact = encode_game(game)
+        compact["_id"] = doc["_id"]
+
+        bytes_before += len(bson.encode(doc))
+        bytes_after += len(bson.encode(compact))
+        migrated += 1
+        if dry_run:
+            # Only the sizes are reported; don't hold on to the documents
+            continue
+
+        # Only replace if no move landed since we read the document
+        batch.append(ReplaceOne(
+            {"_id": doc["_id"], "moves": {"$size": len(game.moves)}}, compact
+        ))
+        if len(batch) >= batch_size:
+            collection.bulk_write(batch, ordered=False)
+            batch = []
+
+    if batch:
+        collection.bulk_write(batch, ordered=False)
+
+    saved = 100 * (1 - bytes_after / bytes_before) if bytes_before else 0.0
+    action = "Would migrate" if dry_run else "Migrated"
+    print(f"{action} {migrated} games: {bytes_before} -> {bytes_after} bytes ({saved:.1f}% smaller)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert games to the compact storage format")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Report the size change without writing")
+    args = parser.parse_args()
+    try:
+        migrate(args.batch_size, args.dry_run)
+    finally:
+        db_client.close()
@@ -0,0 +1,257 @@
+"""Mine tactical puzzles from stored games or PGN files into the puzzle store.
+
+Each game is replayed and every position is searched with MultiPV 2. A
+position becomes a puzzle when the side to move has exactly one clearly
+winning move right after the opponent threw the game away; the solution
+is extended while each further move stays the only winning one. Games
+are spread over a process pool (one Stockfish per worker) and recorded
+in the store once mined, so an interrupted run resumes where it stopped.
+
+Run from the backend directory:
+
+    python -m database.mine_puzzles --workers 8
+    python -m database.mine_puzzles --pgn games1.pgn games2.pgn --depth 14
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import time
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import chess
+import chess.engine
+import chess.pgn
+
+from database.puzzle_store import puzzle_store
+
+MATE_SCORE = 100000
+# Centipawns that count as winning, and the margin the best move must hold over the second best
+WIN_CP = 200
+MIN_GAP_CP = 200
+MAX_PLAYER_MOVES = 4
+PIECE_VALUES = {chess.PAWN: 1, chess.KNIGHT: 3, chess.BISHOP: 3, chess.ROOK: 5, chess.QUEEN: 9, chess.KING: 0}
+
+_engine: Optional[chess.engine.SimpleEngine] = None
+_limit: Optional[chess.engine.Limit] = None
+_shallow_limit = chess.engine.Limit(depth=4)
+
+def _init_worker(stockfish_path: str, depth: int, hash_mb: int):
+    global _engine, _limit
+    _engine = chess.engine.SimpleEngine.popen_uci(stockfish_path)
+    # One search thread per process; the pool provides the parallelism
+    _engine.configure({"Threads": 1, "Hash": hash_mb})
+    _limit = chess.engine.Limit(depth=depth)
+
+def _scores(infos: List[Dict], color: chess.Color) -> List[int]:
+    return [info["score"].pov(color).score(mate_score=MATE_SCORE) for info in infos]
+
+def _unique_win(infos: List[Dict], color: chess.Color) -> bool:
+    scores = _scores(infos, color)
+    if scores[0] < WIN_CP:
+        return False
+    # A single legal move is forced, not found
+    return len(scores) > 1 and scores[1] < WIN_CP and scores[0] - scores[1] >= MIN_GAP_CP
+
+def _solution_line(board: chess.Board, infos: List[Dict]) -> List[str]:
+    """Follow the winning line while each of the solver's moves stays unique"""
+    board = board.copy()
+    color = board.turn
+    line = []
+    for step in range(MAX_PLAYER_MOVES):
+        if step:
+            infos = _engine.analyse(board, _limit, multipv=2)
+            if not _unique_win(infos, color):
+                break
+        line.append(infos[0]["pv"][0].uci())
+        board.push(infos[0]["pv"][0])
+        if board.is_game_over():
+            break
+
+        reply = _engine.analyse(board, _limit)
+        if not reply.get("pv"):
+            break
+        line.append(reply["pv"][0].uci())
+        board.push(reply["pv"][0])
+
+    # The solution ends on the solver's move
+    if len(line) % 2 == 0:
+        line.pop()
+    return line
+
+def tag_themes(board: chess.Board, line: List[str], best_score: int) -> List[str]:
+    """Heuristic Lichess-style theme tags for a solution line"""
+    themes = []
+    player_moves = (len(line) + 1) // 2
+    themes.append({1: "oneMove", 2: "short", 3: "long"}.get(player_moves, "veryLong"))
+
+    first = chess.Move.from_uci(line[0])
+    captured = board.piece_at(first.to_square)
+    moved = board.piece_at(first.from_square)
+    if first.promotion:
+        themes.append("promotion")
+    if not captured and not first.promotion and not board.gives_check(first):
+        themes.append("quietMove")
+    if (board.is_attacked_by(not board.turn, first.to_square)
+            and PIECE_VALUES[moved.piece_type] > (PIECE_VALUES[captured.piece_type] if captured else 0) + 1):
+        themes.append("sacrifice")
+
+    board = board.copy()
+    color = board.turn
+    fork = False
+    for ply, uci in enumerate(line):
+        move = chess.Move.from_uci(uci)
+        board.push(move)
+        if ply % 2 == 0 and not fork:
+            targets = [
+                square for square in board.attacks(move.to_square)
+                if board.color_at(square) == (not color)
+                and board.piece_type_at(square) in (chess.KING, chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT)
+            ]
+            fork = len(targets) >= 2
+
+    if fork:
+        themes.append("fork")
+    if board.is_checkmate():
+        themes += ["mate", f"mateIn{player_moves}"]
+        mating_piece = board.piece_type_at(chess.Move.from_uci(line[-1]).to_square)
+        if chess.square_rank(board.king(not color)) in (0, 7) and mating_piece in (chess.ROOK, chess.QUEEN):
+            themes.append("backRankMate")
+    else:
+        themes.append("crushing" if best_score >= 600 else "advantage")
+    return themes
+
+def estimate_rating(board: chess.Board, line: List[str], themes: List[str]) -> int:
+    """Rough difficulty: longer, quiet and sacrificial lines and ones a shallow search misses rate higher"""
+    rating = 1000 + 300 * ((len(line) + 1) // 2 - 1)
+    if "quietMove" in themes:
+        rating += 200
+    if "sacrifice" in themes:
+        rating += 250
+    shallow = _engine.analyse(board, _shallow_limit)
+    if shallow.get("pv") and shallow["pv"][0].uci() != line[0]:
+        rating += 300
+    return max(600, min(2800, rating))
+
+def puzzle_id_for(fen: str) -> str:
+    # Same position from different games is one puzzle
+    return "mined_" + hashlib.sha1(chess.Board(fen).epd().encode("utf-8")).hexdigest()[:12]
+
+def mine_game(task: Tuple[str, str, List[str], int]) -> Tuple[str, int, List[Dict[str, Any]]]:
+    """Worker entry point: returns (game_key, positions searched, puzzles)"""
+    game_key, start_fen, moves, min_ply = task
+    board = chess.Board(start_fen)
+    puzzles = []
+    analysed = 0
+    previous: Optional[List[Dict]] = None
+
+    for ply, uci in enumerate(moves):
+        if ply >= min_ply and not board.is_game_over():
+            infos = _engine.analyse(board, _limit, multipv=2)
+            analysed += 1
+            # Only after a blunder: the side to move was not already winning a ply ago
+            was_winning = previous is not None and _scores(previous, board.turn)[0] >= WIN_CP
+            if not was_winning and _unique_win(infos, board.turn):
+                line = _solution_line(board, infos)
+                if line:
+                    themes = tag_themes(board, line, _scores(infos, board.turn)[0])
+                    puzzles.append({
+                        "puzzle_id": puzzle_id_for(board.fen()),
+                        "fen": board.fen(),
+                        "solution": line,
+                        "rating": estimate_rating(board, line, themes),
+                        "themes": themes,
+                        "game_url": None
+                    })
+            previous = infos
+        board.push_uci(uci)
+    return game_key, analysed, puzzles
+
+def iter_mongo_games() -> Iterator[Tuple[str, str, List[str]]]:
+    from database.db_client import db_client
+
+    projection = {"game_id": 1, "moves": 1, "start_fen": 1, "positions": {"$slice": 1}}
+    for doc in db_client.get_collection("games").find({}, projection).sort("_id", 1):
+        start_fen = doc.get("start_fen") or (doc.get("positions") or [chess.STARTING_FEN])[0]
+        yield f"game:{doc['game_id']}", start_fen, doc.get("moves", [])
+
+def iter_pgn_games(paths: List[str]) -> Iterator[Tuple[str, str, List[str]]]:
+    for path in paths:
+        with open(path) as f:
+            index = 0
+            while True:
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    break
+                yield f"pgn:{os.path.basename(path)}:{index}", game.board().fen(), [
+                    move.uci() for move in game.mainline_moves()
+                ]
+                index += 1
+
+def _batches(games: Iterator, size: int) -> Iterator[List]:
+    batch = []
+    for game in games:
+        batch.append(game)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def mine(games: Iterator[Tuple[str, str, List[str]]], stockfish_path: str, workers: int,
+         depth: int = 12, min_ply: int = 8, hash_mb: int = 64, limit: int = None):
+    started = time.perf_counter()
+    seen = set()
+    mined_games = 0
+    positions = 0
+    found = 0
+
+    with multiprocessing.Pool(workers, initializer=_init_worker,
+                              initargs=(stockfish_path, depth, hash_mb)) as pool:
+        # Small batches bound memory and make progress durable after each one
+        for batch in _batches(games, workers * 4):
+            done = puzzle_store.mined(key for key, _, _ in batch)
+            tasks = [(key, fen, moves, min_ply) for key, fen, moves in batch if key not in done]
+
+            new_puzzles = []
+            for _, analysed, puzzles in pool.imap_unordered(mine_game, tasks):
+                positions += analysed
+                for puzzle in puzzles:
+                    if puzzle["puzzle_id"] not in seen:
+                        seen.add(puzzle["puzzle_id"])
+                        new_puzzles.append(puzzle)
+
+            existing = puzzle_store.exists(puzzle["puzzle_id"] for puzzle in new_puzzles)
+            found += puzzle_store.insert_many(
+                puzzle for puzzle in new_puzzles if puzzle["puzzle_id"] not in existing
+            )
+            puzzle_store.mark_mined(key for key, _, _, _ in tasks)
+            mined_games += len(tasks)
+
+            elapsed = time.perf_counter() - started
+            print(f"{mined_games} games, {positions} positions ({positions / elapsed:.1f}/s), "
+                  f"{found} new puzzles, {len(batch) - len(tasks)} already mined")
+            if limit and mined_games >= limit:
+                break
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mine puzzles from games into the puzzle store")
+    parser.add_argument("--pgn", nargs="+", help="PGN files to mine instead of the games collection")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--depth", type=int, default=12)
+    parser.add_argument("--min-ply", type=int, default=8, help="Skip the opening plies")
+    parser.add_argument("--hash-mb", type=int, default=64, help="Engine hash per worker")
+    parser.add_argument("--limit", type=int, help="Stop after this many games")
+    parser.add_argument("--stockfish", help="Engine binary (defaults to the server's lookup)")
+    args = parser.parse_args()
+
+    stockfish_path = args.stockfish
+    if not stockfish_path:
+        from stockfish.engine import stockfish_engine
+        stockfish_path = stockfish_engine.stockfish_path
+
+    games = iter_pgn_games(args.pgn) if args.pgn else iter_mongo_games()
+    try:
+        mine(games, stockfish_path, args.workers, args.depth, args.min_ply, args.hash_mb, args.limit)
+    finally:
+        puzzle_store.close()
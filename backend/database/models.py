@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Dict
 from datetime import datetime
 from enum import Enum
@@ -20,6 +20,11 @@ class User(BaseModel):
     games_played: int = 0
     puzzles_solved: int = 0
 
+class Principal(BaseModel):
+    """Identity taken from a token's signed claims, without a users lookup"""
+    user_id: str
+    username: str
+
 class GameType(str, Enum):
     PRACTICE = "practice"
     VS_STOCKFISH = "vs_stockfish"
@@ -35,10 +40,16 @@ class Game(BaseModel):
     moves: List[str] = []
     positions: List[str] = []
     analysis: List[Dict] = []
+    defer_explanations: bool = False  # LLM explanations filled in by a background job
     result: Optional[str] = None
     started_at: datetime = datetime.now()
     ended_at: Optional[datetime] = None
 
+class DifficultyLevel(str, Enum):
+    BEGINNER = "beginner"
+    INTERMEDIATE = "intermediate"
+    ADVANCED = "advanced"
+
 class PuzzleAttempt(BaseModel):
     attempt_id: str
     user_id: str
@@ -46,3 +57,14 @@ class PuzzleAttempt(BaseModel):
     solved: bool
     time_taken: float
     attempted_at: datetime = datetime.now()
+
+class Feedback(BaseModel):
+    feedback_id: str
+    user_id: str
+    puzzle_id: Optional[str] = None
+    move_sequence: List[str]
+    correct: bool
+    time_taken: float
+    difficulty_level: str
+    # Per instance, since batched events are sorted by it
+    created_at: datetime = Field(default_factory=datetime.now)
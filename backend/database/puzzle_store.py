@@ -0,0 +1,301 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+from typing import Optional, Dict, Any, List, Iterable, Set
+
+import chess
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Upper bound for the per-puzzle random sort key
+SHUFFLE_RANGE = 2 ** 31
+
+def build_response_tree(fen: str, solution: List[str]) -> List[Dict[str, Any]]:
+    """Precompute, per solver move, the position, the expected move and the accepted moves.
+
+    ``moves`` maps each accepted move to the opponent's reply, or None when
+    it ends the puzzle. Besides the solution move, any move that mates
+    on the spot is accepted and finishes the puzzle.
+    """
+    board = chess.Board(fen)
+    tree = []
+    for i in range(0, len(solution), 2):
+        best = solution[i]
+        reply = solution[i + 1] if i + 1 < len(solution) else None
+        moves = {best: reply}
+        for move in board.legal_moves:
+            board.push(move)
+            if board.is_checkmate():
+                moves.setdefault(move.uci(), None)
+            board.pop()
+        tree.append({"fen": board.fen(), "best": best, "moves": moves})
+
+        board.push_uci(best)
+        if reply:
+            board.push_uci(reply)
+    return tree
+
+class PuzzleStore:
+    """Local SQLite store of curated puzzles, indexed by rating and theme.
+
+    Every puzzle gets a random ``shuffle`` key at import time. Selection
+    seeks to a random (rating, shuffle) point inside the requested band, so
+    picking a puzzle is a single index lookup and puzzles sharing a rating
+    are still served in random order. The puzzle count is read once when
+    the store opens and then kept up to date by ``insert_many``, so stats
+    never scan the table. Engine-generated fallbacks live in a separate
+    table that only ``get`` reads, so they are never selected as curated.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("PUZZLE_DB_PATH") or os.path.join(
+            os.path.dirname(__file__), "puzzles.sqlite3"
+        )
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._count: Optional[int] = None
+
+        self.selections = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS puzzles ("
+                " puzzle_id TEXT PRIMARY KEY, fen TEXT NOT NULL, solution TEXT NOT NULL,"
+                " rating INTEGER NOT NULL, rating_deviation INTEGER, popularity INTEGER,"
+                " nb_plays INTEGER, themes TEXT NOT NULL, game_url TEXT, shuffle INTEGER NOT NULL,"
+                " tree TEXT);"
+                "CREATE INDEX IF NOT EXISTS puzzles_by_rating ON puzzles (rating, shuffle);"
+                "CREATE TABLE IF NOT EXISTS puzzle_themes ("
+                " theme TEXT NOT NULL, rating INTEGER NOT NULL, shuffle INTEGER NOT NULL,"
+                " puzzle_id TEXT NOT NULL, PRIMARY KEY (theme, rating, shuffle, puzzle_id)"
+                ") WITHOUT ROWID;"
+                "CREATE TABLE IF NOT EXISTS mined_games (game_key TEXT PRIMARY KEY) WITHOUT ROWID;"
+                "CREATE TABLE IF NOT EXISTS generated_puzzles ("
+                " puzzle_id TEXT PRIMARY KEY, fen TEXT NOT NULL, solution TEXT NOT NULL,"
+                " rating INTEGER NOT NULL, themes TEXT NOT NULL, game_url TEXT, tree TEXT);"
+            )
+            # Stores created before response trees existed; their trees are built on first lookup
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(puzzles)")}
+            if "tree" not in columns:
+                self._conn.execute("ALTER TABLE puzzles ADD COLUMN tree TEXT")
+            # Fallbacks once stored among the curated puzzles ('`' sorts right after '_')
+            generated = "puzzle_id >= 'generated_' AND puzzle_id < 'generated`'"
+            self._conn.execute(
+                "INSERT OR IGNORE INTO generated_puzzles SELECT puzzle_id, fen, solution, rating,"
+                f" themes, game_url, tree FROM puzzles WHERE {generated}"
+            )
+            self._conn.execute(f"DELETE FROM puzzles WHERE {generated}")
+            self._conn.commit()
+            self._count = self._conn.execute("SELECT COUNT(*) FROM puzzles").fetchone()[0]
+        return self._conn
+
+    @staticmethod
+    def _existing(conn: sqlite3.Connection, puzzle_ids: List[str]) -> Set[str]:
+        found = set()
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(puzzle_ids), 500):
+            chunk = puzzle_ids[start:start + 500]
+            found.update(row[0] for row in conn.execute(
+                f"SELECT puzzle_id FROM puzzles WHERE puzzle_id IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        return found
+
+    @staticmethod
+    def parse_lichess_row(row: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """Convert a Lichess puzzle CSV row into a stored puzzle.
+
+        Lichess gives the position before the opponent's last move and lists
+        that move first; the puzzle starts after it, so the stored FEN has it
+        applied and the solution is the remaining line. Rows with illegal
+        moves are rejected.
+        """
+        try:
+            board = chess.Board(row["FEN"])
+            moves = row["Moves"].split()
+            board.push_uci(moves[0])
+            fen = board.fen()
+            for move in moves[1:]:
+                board.push_uci(move)
+        except (KeyError, IndexError, ValueError):
+            return None
+        if len(moves) < 2:
+            return None
+
+        return {
+            "puzzle_id": row["PuzzleId"],
+            "fen": fen,
+            "solution": moves[1:],
+            "rating": int(row["Rating"]),
+            "rating_deviation": int(row.get("RatingDeviation") or 0),
+            "popularity": int(row.get("Popularity") or 0),
+            "nb_plays": int(row.get("NbPlays") or 0),
+            "themes": (row.get("Themes") or "").split(),
+            "game_url": row.get("GameUrl")
+        }
+
+    def insert_many(self, puzzles: Iterable[Dict[str, Any]]) -> int:
+        rows = []
+        theme_rows = []
+        for puzzle in puzzles:
+            shuffle = random.randrange(SHUFFLE_RANGE)
+            rows.append((
+                puzzle["puzzle_id"], puzzle["fen"], " ".join(puzzle["solution"]), puzzle["rating"],
+                puzzle.get("rating_deviation"), puzzle.get("popularity"), puzzle.get("nb_plays"),
+                " ".join(puzzle["themes"]), puzzle.get("game_url"), shuffle,
+                # Bulk imports leave the tree to be built on first lookup
+                json.dumps(puzzle["tree"]) if puzzle.get("tree") else None
+            ))
+            theme_rows.extend(
+                (theme, puzzle["rating"], shuffle, puzzle["puzzle_id"]) for theme in puzzle["themes"]
+            )
+
+        with self._lock:
+            conn = self._connect()
+            added = len({row[0] for row in rows} - self._existing(conn, [row[0] for row in rows]))
+            # Re-importing a puzzle replaces it, including its theme rows
+            conn.executemany("DELETE FROM puzzle_themes WHERE puzzle_id = ?", [(row[0],) for row in rows])
+            conn.executemany("INSERT OR REPLACE INTO puzzles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.executemany("INSERT OR REPLACE INTO puzzle_themes VALUES (?, ?, ?, ?)", theme_rows)
+            conn.commit()
+            self._count += added
+        return len(rows)
+
+    @staticmethod
+    def _to_puzzle(row: tuple) -> Dict[str, Any]:
+        puzzle_id, fen, solution, rating, themes, game_url = row
+        return {
+            "puzzle_id": puzzle_id,
+            "fen": fen,
+            "solution": solution.split(),
+            "rating": rating,
+            "themes": themes.split(),
+            "game_url": game_url
+        }
+
+    def insert_generated(self, puzzle: Dict[str, Any]):
+        """Keep an engine-generated fallback so any worker can validate and hint it"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO generated_puzzles VALUES (?, ?, ?, ?, ?, ?, ?)", (
+                puzzle["puzzle_id"], puzzle["fen"], " ".join(puzzle["solution"]), puzzle["rating"],
+                " ".join(puzzle.get("themes", [])), puzzle.get("game_url"),
+                json.dumps(puzzle["tree"]) if puzzle.get("tree") else None
+            ))
+            conn.commit()
+
+    def get(self, puzzle_id: str) -> Optional[Dict[str, Any]]:
+        """A puzzle with its response tree, for validating and hinting"""
+        with self._lock:
+            conn = self._connect()
+            for table in ("puzzles", "generated_puzzles"):
+                row = conn.execute(
+                    f"SELECT puzzle_id, fen, solution, rating, themes, game_url, tree FROM {table} WHERE puzzle_id = ?",
+                    (puzzle_id,)
+                ).fetchone()
+                if row is not None:
+                    break
+            else:
+                return None
+
+            puzzle = self._to_puzzle(row[:-1])
+            if row[-1]:
+                puzzle["tree"] = json.loads(row[-1])
+            else:
+                puzzle["tree"] = build_response_tree(puzzle["fen"], puzzle["solution"])
+                conn.execute(f"UPDATE {table} SET tree = ? WHERE puzzle_id = ?",
+                             (json.dumps(puzzle["tree"]), puzzle_id))
+                conn.commit()
+        return puzzle
+
+    def select(self, min_rating: int, max_rating: int, theme: str = None) -> Optional[Dict[str, Any]]:
+        """Pick a random puzzle rated within [min_rating, max_rating], optionally with a theme"""
+        rating = random.randint(min_rating, max_rating)
+        shuffle = random.randrange(SHUFFLE_RANGE)
+        if theme:
+            source = "puzzle_themes t JOIN puzzles p ON p.puzzle_id = t.puzzle_id WHERE t.theme = ? AND "
+            params = (theme,)
+            key = "(t.rating, t.shuffle)"
+            order = "t.rating, t.shuffle"
+        else:
+            source = "puzzles p WHERE "
+            params = ()
+            key = "(p.rating, p.shuffle)"
+            order = "p.rating, p.shuffle"
+        columns = "p.puzzle_id, p.fen, p.solution, p.rating, p.themes, p.game_url"
+
+        with self._lock:
+            conn = self._connect()
+            # Seek forward from the random point, wrapping to the part of the band below it
+            row = conn.execute(
+                f"SELECT {columns} FROM {source}{key} >= (?, ?) AND {key} <= (?, ?) ORDER BY {order} LIMIT 1",
+                params + (rating, shuffle, max_rating, SHUFFLE_RANGE)
+            ).fetchone()
+            if row is None:
+                row = conn.execute(
+                    f"SELECT {columns} FROM {source}{key} >= (?, ?) AND {key} < (?, ?) ORDER BY {order} LIMIT 1",
+                    params + (min_rating, 0, rating, shuffle)
+                ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+        self.selections += 1
+        return self._to_puzzle(row)
+
+    def exists(self, puzzle_ids: Iterable[str]) -> Set[str]:
+        puzzle_ids = list(puzzle_ids)
+        with self._lock:
+            return self._existing(self._connect(), puzzle_ids)
+
+    def mined(self, game_keys: Iterable[str]) -> Set[str]:
+        """Which of these games the mining pipeline has already processed"""
+        game_keys = list(game_keys)
+        with self._lock:
+            conn = self._connect()
+            return {
+                row[0] for row in conn.execute(
+                    f"SELECT game_key FROM mined_games WHERE game_key IN ({','.join('?' * len(game_keys))})",
+                    game_keys
+                )
+            } if game_keys else set()
+
+    def mark_mined(self, game_keys: Iterable[str]):
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("INSERT OR IGNORE INTO mined_games VALUES (?)", [(key,) for key in game_keys])
+            conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            self._connect()
+            return self._count
+
+    def themes(self) -> List[str]:
+        with self._lock:
+            rows = self._connect().execute("SELECT DISTINCT theme FROM puzzle_themes").fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            # None until the store is first opened; imports by other processes
+            # show up after a restart
+            "puzzles": self._count,
+            "selections": self.selections,
+            "misses": self.misses
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+                self._count = None
+
+puzzle_store = PuzzleStore()
@@ -1,3 +1,6 @@
+import time
+_import_started = time.perf_counter()
+
 from routes.auth import router as auth_router
 from routes.game import router as game_router
 from routes.analysis import router as analysis_router
@@ -12,7 +15,22 @@ import uvicorn
 
 from routes import move, puzzle, feedback
 from database.db_client import db_client
+from database.indexes import apply_indexes
 from stockfish.engine import stockfish_engine
+from cache.eval_cache import eval_cache
+from database.puzzle_store import puzzle_store
+from cache.cache_manager import cache_manager
+from reasoning.ollama_client import ollama_client
+from services.explanation_queue import explanation_queue
+from services.feedback_writer import feedback_writer
+from services.puzzle_buffer import puzzle_buffer
+from services.game_service import game_service
+from services.auth_service import auth_service
+from services.tutor_service import tutor_service
+from services.startup_report import startup_report
+from services.executor import run_blocking
+
+startup_report.record("imports", time.perf_counter() - _import_started)
 
 
 
@@ -20,15 +38,39 @@ from stockfish.engine import stockfish_engine
 async def lifespan(app: FastAPI):
     # Startup
     print("Starting Adaptive AI Chess Tutor...")
-    db_client.connect()
-    stockfish_engine.start_engine()
+    with startup_report.phase("database"):
+        await db_client.ping()
+    with startup_report.phase("indexes"):
+        index_report = await apply_indexes()
+    for collection_name, diff in index_report.items():
+        if diff["missing"] or diff["extra"]:
+            print(f"Index drift on {collection_name}: missing={diff['missing']} extra={diff['extra']}")
+    with startup_report.phase("stockfish"):
+        stockfish_engine.start_engine()
+    with startup_report.phase("rl_policy"):
+        # Off the loop: the torch backend imports torch and builds the model here
+        await run_blocking(tutor_service.tutor.load_policy)
+    with startup_report.phase("background_workers"):
+        explanation_queue.start()
+        feedback_writer.start()
+        puzzle_buffer.start()
+        game_service.sessions.start()
     print("Services started successfully!")
+    startup_report.print()
     
     yield
     
     # Shutdown
     print("Shutting down...")
+    await explanation_queue.stop()
+    await feedback_writer.stop()
+    await puzzle_buffer.stop()
+    await game_service.sessions.close()
+    await tutor_service.tutor.learner_state.close()
     stockfish_engine.stop_engine()
+    await ollama_client.close()
+    eval_cache.close()
+    puzzle_store.close()
     db_client.close()
     print("Services stopped.")
 
@@ -65,9 +107,21 @@ async def health_check():
     return {
         "status": "healthy",
         "services": {
-            "database": "connected" if db_client.client else "disconnected",
-            "stockfish": "running" if stockfish_engine.engine else "stopped"
-        }
+            "database": "connected" if db_client.async_client else "disconnected",
+            "stockfish": "running" if stockfish_engine.running else "stopped"
+        },
+        "engine_pool": stockfish_engine.pool.stats() if stockfish_engine.running else {},
+        "eval_cache": eval_cache.stats(),
+        "puzzle_store": puzzle_store.stats(),
+        "puzzle_buffer": puzzle_buffer.stats(),
+        "rl_policy": tutor_service.tutor.policy.stats(),
+        "learner_state": tutor_service.tutor.learner_state.stats(),
+        "startup": startup_report.summary(),
+        "response_cache": cache_manager.stats(),
+        "explanation_queue": explanation_queue.stats(),
+        "feedback_writer": feedback_writer.stats(),
+        "auth_cache": auth_service.principals.stats(),
+        "game_sessions": game_service.sessions.stats()
     }
 
 if __name__ == "__main__":
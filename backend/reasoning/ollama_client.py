@@ -1,24 +1,71 @@
-import requests
+import httpx
 import json
-from typing import Optional
+from typing import Optional, AsyncIterator
 from cache.cache_manager import cache_manager
 
+# Bump a template's version whenever its wording changes so stale explanations are not served
+PROMPT_TEMPLATE_VERSIONS = {
+    "explain_move": 1,
+    "suggest_improvement": 1
+}
+
+def normalize_fen(fen: str) -> str:
+    """Drop the halfmove/fullmove clocks, which don't change the explanation"""
+    return " ".join(fen.split()[:4])
+
 class OllamaClient:
     def __init__(self, base_url: str = "http://localhost:11434", model: str = "mistral"):
         self.base_url = base_url
         self.model = model
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared async HTTP client so requests reuse pooled keep-alive connections"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+            )
+        return self._client
+    
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
-    def query_ollama(self, prompt: str, max_tokens: int = 500) -> Optional[str]:
+    def prompt_cache_key(self, prompt: str, max_tokens: int, template_id: str = None,
+                         **fields) -> str:
+        """Content-addressed cache key, stable across workers and restarts"""
+        if template_id:
+            return cache_manager.generate_content_key(
+                "ollama_response",
+                model=self.model,
+                template=template_id,
+                template_version=PROMPT_TEMPLATE_VERSIONS.get(template_id, 0),
+                options={"num_predict": max_tokens},
+                **fields
+            )
+        return cache_manager.generate_content_key(
+            "ollama_response",
+            model=self.model,
+            prompt=prompt,
+            options={"num_predict": max_tokens}
+        )
+    
+    async def query_ollama(self, prompt: str, max_tokens: int = 500, template_id: str = None,
+                           **key_fields) -> Optional[str]:
         """Query Ollama model with caching"""
-        cache_key = cache_manager.generate_cache_key(hash(prompt), "ollama_response")
-        cached_response = cache_manager.get(cache_key)
+        cache_key = self.prompt_cache_key(prompt, max_tokens, template_id, **key_fields)
+        cached_response = await cache_manager.aget(cache_key)
         
         if cached_response:
             return cached_response
         
         try:
-            response = requests.post(
-                f"{self.base_url}/api/generate",
+            response = await self.client.post(
+                "/api/generate",
                 json={
                     "model": self.model,
                     "prompt": prompt,
@@ -26,8 +73,7 @@ class OllamaClient:
                     "options": {
                         "num_predict": max_tokens
                     }
-                },
-                timeout=30
+                }
             )
             
             if response.status_code == 200:
@@ -35,20 +81,66 @@ class OllamaClient:
                 response_text = result.get("response", "").strip()
                 
                 # Cache the response
-                cache_manager.set(cache_key, response_text, expire_seconds=86400)  # 24 hours
+                await cache_manager.aset(cache_key, response_text, expire_seconds=86400)  # 24 hours
                 
                 return response_text
             else:
                 print(f"Ollama API error: {response.status_code} - {response.text}")
                 return None
                 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"Error connecting to Ollama: {e}")
             return None
     
-    def explain_move(self, fen: str, move: str, context: str = "") -> str:
-        """Generate human-readable explanation for a chess move"""
-        prompt = f"""
+    async def stream_ollama(self, prompt: str, max_tokens: int = 500, template_id: str = None,
+                            **key_fields) -> AsyncIterator[str]:
+        """Yield the model's response token by token, caching the full text once done"""
+        cache_key = self.prompt_cache_key(prompt, max_tokens, template_id, **key_fields)
+        cached_response = await cache_manager.aget(cache_key)
+        
+        if cached_response:
+            yield cached_response
+            return
+        
+        parts = []
+        try:
+            async with self.client.stream(
+                "POST",
+                "/api/generate",
+                json={
+                    "model": self.model,
+                    "prompt": prompt,
+                    "stream": True,
+                    "options": {
+                        "num_predict": max_tokens
+                    }
+                }
+            ) as response:
+                if response.status_code != 200:
+                    body = await response.aread()
+                    print(f"Ollama API error: {response.status_code} - {body.decode(errors='replace')}")
+                    return
+                
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    token = chunk.get("response", "")
+                    if token:
+                        parts.append(token)
+                        yield token
+                    if chunk.get("done"):
+                        break
+        except httpx.HTTPError as e:
+            print(f"Error connecting to Ollama: {e}")
+            return
+        
+        response_text = "".join(parts).strip()
+        if response_text:
+            await cache_manager.aset(cache_key, response_text, expire_seconds=86400)  # 24 hours
+    
+    def _explain_prompt(self, fen: str, move: str, context: str) -> str:
+        return f"""
         You are an expert chess tutor. Explain the move {move} in the position {fen}.
         
         Context: {context}
@@ -61,13 +153,9 @@ class OllamaClient:
         
         Keep the explanation beginner-friendly but insightful.
         """
-        
-        explanation = self.query_ollama(prompt)
-        return explanation or "Unable to generate explanation at this time."
     
-    def suggest_improvement(self, fen: str, user_move: str, best_move: str) -> str:
-        """Suggest improvement when user makes a suboptimal move"""
-        prompt = f"""
+    def _improvement_prompt(self, fen: str, user_move: str, best_move: str) -> str:
+        return f"""
         You are a chess coach. The user played {user_move} in position {fen}, 
         but the best move was {best_move}. 
         
@@ -78,8 +166,36 @@ class OllamaClient:
         
         Be encouraging and constructive in your feedback.
         """
-        
-        return self.query_ollama(prompt) or "Good effort! Consider analyzing this position further."
+    
+    async def explain_move(self, fen: str, move: str, context: str = "") -> str:
+        """Generate human-readable explanation for a chess move"""
+        explanation = await self.query_ollama(
+            self._explain_prompt(fen, move, context), template_id="explain_move",
+            fen=normalize_fen(fen), move=move, context=context
+        )
+        return explanation or "Unable to generate explanation at this time."
+    
+    def stream_explain_move(self, fen: str, move: str, context: str = "") -> AsyncIterator[str]:
+        """Streaming variant of explain_move"""
+        return self.stream_ollama(
+            self._explain_prompt(fen, move, context), template_id="explain_move",
+            fen=normalize_fen(fen), move=move, context=context
+        )
+    
+    async def suggest_improvement(self, fen: str, user_move: str, best_move: str) -> str:
+        """Suggest improvement when user makes a suboptimal move"""
+        response = await self.query_ollama(
+            self._improvement_prompt(fen, user_move, best_move), template_id="suggest_improvement",
+            fen=normalize_fen(fen), user_move=user_move, best_move=best_move
+        )
+        return response or "Good effort! Consider analyzing this position further."
+    
+    def stream_suggest_improvement(self, fen: str, user_move: str, best_move: str) -> AsyncIterator[str]:
+        """Streaming variant of suggest_improvement"""
+        return self.stream_ollama(
+            self._improvement_prompt(fen, user_move, best_move), template_id="suggest_improvement",
+            fen=normalize_fen(fen), user_move=user_move, best_move=best_move
+        )
 
 # Global Ollama client
 ollama_client = OllamaClient()
@@ -1,12 +1,16 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List
-from datetime import datetime
+import uuid
 from database.db_client import db_client
 from database.models import Feedback
+from services.feedback_writer import feedback_writer
 
 router = APIRouter()
 
+# Largest array accepted by /submit/bulk
+MAX_BULK_EVENTS = 1000
+
 class FeedbackRequest(BaseModel):
     user_id: str
     puzzle_id: str = None
@@ -15,11 +19,9 @@ class FeedbackRequest(BaseModel):
     time_taken: float
     difficulty_level: str
 
-@router.post("/submit")
-async def submit_feedback(request: FeedbackRequest):
-    """Store user performance feedback for RL training"""
-    feedback = Feedback(
-        feedback_id=f"fb_{datetime.now().timestamp()}",
+def _to_feedback(request: FeedbackRequest) -> Feedback:
+    return Feedback(
+        feedback_id=f"fb_{uuid.uuid4().hex}",
         user_id=request.user_id,
         puzzle_id=request.puzzle_id,
         move_sequence=request.move_sequence,
@@ -27,18 +29,40 @@ async def submit_feedback(request: FeedbackRequest):
         time_taken=request.time_taken,
         difficulty_level=request.difficulty_level
     )
+
+async def _buffer(events: List[Feedback]):
+    if not await feedback_writer.submit([event.dict() for event in events]):
+        raise HTTPException(
+            status_code=503,
+            detail="Feedback buffer is full, retry later",
+            headers={"Retry-After": "1"}
+        )
+
+@router.post("/submit")
+async def submit_feedback(request: FeedbackRequest):
+    """Store user performance feedback for RL training"""
+    feedback = _to_feedback(request)
+    await _buffer([feedback])
+    
+    return {"success": True, "feedback_id": feedback.feedback_id}
+
+@router.post("/submit/bulk")
+async def submit_feedback_bulk(requests: List[FeedbackRequest]):
+    """Store a batch of feedback events; they are written asynchronously"""
+    if len(requests) > MAX_BULK_EVENTS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_EVENTS} events per request")
     
-    # Store in MongoDB
-    collection = db_client.get_collection("feedback")
-    result = collection.insert_one(feedback.dict())
+    events = [_to_feedback(request) for request in requests]
+    if events:
+        await _buffer(events)
     
-    return {"success": True, "feedback_id": str(result.inserted_id)}
+    return {"success": True, "accepted": len(events), "feedback_ids": [event.feedback_id for event in events]}
 
 @router.get("/user/{user_id}")
 async def get_user_feedback(user_id: str):
     """Get feedback history for a user"""
-    collection = db_client.get_collection("feedback")
-    feedback_data = list(collection.find({"user_id": user_id}).sort("created_at", -1).limit(50))
+    collection = db_client.get_async_collection("feedback")
+    feedback_data = await collection.find({"user_id": user_id}).sort("created_at", -1).limit(50).to_list(length=50)
     
     # Convert ObjectId to string for JSON serialization
     for item in feedback_data:
@@ -2,7 +2,6 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
-import chess
 
 from services.game_service import game_service
 from services.auth_service import auth_service
@@ -15,16 +14,17 @@ class CreateGameRequest(BaseModel):
     white_player: str
     black_player: str
     stockfish_level: Optional[int] = None
+    defer_explanations: Optional[bool] = None
 
 class MakeMoveRequest(BaseModel):
     game_id: str
     move: str
-    fen: str
+    fen: Optional[str] = None  # Ignored; the server tracks the game's position
 
-def get_current_user(token: str):
+async def get_current_user(token: str):
     if not token:
         raise HTTPException(status_code=401, detail="Token required")
-    user = auth_service.verify_token(token)
+    user = await auth_service.verify_token(token)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid token")
     return user
@@ -32,12 +32,13 @@ def get_current_user(token: str):
 @router.post("/create")
 async def create_game(request: CreateGameRequest, user: dict = Depends(get_current_user)):
     try:
-        game = game_service.create_game(
+        game = await game_service.create_game(
             user.user_id,
             request.game_type,
             request.white_player,
             request.black_player,
-            request.stockfish_level
+            request.stockfish_level,
+            request.defer_explanations
         )
         return {"success": True, "game": game.dict()}
     except Exception as e:
@@ -46,16 +47,8 @@ async def create_game(request: CreateGameRequest, user: dict = Depends(get_curre
 @router.post("/move")
 async def make_move(request: MakeMoveRequest, user: dict = Depends(get_current_user)):
     try:
-        # Validate the move locally first
-        board = chess.Board(request.fen)
-        try:
-            move = chess.Move.from_uci(request.move)
-            if move not in board.legal_moves:
-                return {"valid": False, "error": "Illegal move"}
-        except ValueError:
-            return {"valid": False, "error": "Invalid move notation"}
-        
-        result = game_service.make_move(request.game_id, request.move, user.user_id)
+        # Legality is checked against the server-side board of the live game session
+        result = await game_service.make_move(request.game_id, request.move, user.user_id)
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -63,19 +56,52 @@ async def make_move(request: MakeMoveRequest, user: dict = Depends(get_current_u
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/user/{user_id}")
-async def get_user_games(user_id: str):
+async def get_user_games(user_id: str, limit: int = 20, cursor: Optional[str] = None,
+                         fields: Optional[str] = None):
+    """Paginated game history; ``fields`` is a comma-separated list of Game fields"""
     try:
-        games = game_service.get_user_games(user_id)
-        return {"success": True, "games": [game.dict() for game in games]}
+        selected = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+        page = await game_service.get_user_games(user_id, limit, cursor, selected)
+        return {"success": True, **page}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{game_id}")
 async def get_game(game_id: str, user: dict = Depends(get_current_user)):
     try:
-        game = game_service.get_game(game_id)
+        game = await game_service.get_game(game_id)
         if game.user_id != user.user_id:
             raise HTTPException(status_code=403, detail="Access denied")
         return {"success": True, "game": game.dict()}
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/{game_id}/explanation/{ply}")
+async def get_explanation(game_id: str, ply: int, user: dict = Depends(get_current_user)):
+    """Fetch a (possibly deferred) move explanation by ply index"""
+    try:
+        game = await game_service.get_game(game_id)
+        if game.user_id != user.user_id:
+            raise HTTPException(status_code=403, detail="Access denied")
+        explanation = await game_service.get_explanation(game_id, ply)
+        return {"success": True, **explanation}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/{game_id}/analysis/{ply}")
+async def analyze_ply(game_id: str, ply: int, user: dict = Depends(get_current_user)):
+    """Request full tutoring for a ply that wasn't tutored inline (e.g. Stockfish's reply)"""
+    try:
+        game = await game_service.get_game(game_id)
+        if game.user_id != user.user_id:
+            raise HTTPException(status_code=403, detail="Access denied")
+        analysis = await game_service.analyze_ply(game_id, ply)
+        return {"success": True, "analysis": analysis}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
@@ -24,11 +24,16 @@ class MoveResponse(BaseModel):
 @router.post("/analyze", response_model=MoveResponse)
 async def analyze_move(request: MoveRequest):
     """Analyze a chess move with AI tutoring"""
-    return tutor_service.analyze_move(request.fen, request.move, request.user_id)
+    return await tutor_service.analyze_move(request.fen, request.move, request.user_id)
 
 @router.websocket("/ws/tutor")
 async def websocket_tutor(websocket: WebSocket):
-    """WebSocket endpoint for real-time tutoring"""
+    """WebSocket endpoint for real-time tutoring
+
+    By default results are streamed as staged frames (legality, evaluation
+    updates, LLM tokens, then a final ``complete`` frame with the full
+    analysis). Send ``"stream": false`` to receive only the full analysis.
+    """
     await websocket.accept()
     
     try:
@@ -36,8 +41,17 @@ async def websocket_tutor(websocket: WebSocket):
             data = await websocket.receive_text()
             move_data = json.loads(data)
             
+            if move_data.get("stream", True):
+                async for frame in tutor_service.stream_analysis(
+                    move_data["fen"],
+                    move_data["move"],
+                    move_data["user_id"]
+                ):
+                    await websocket.send_text(json.dumps(frame))
+                continue
+            
             # Analyze the move
-            result = tutor_service.analyze_move(
+            result = await tutor_service.analyze_move(
                 move_data["fen"], 
                 move_data["move"], 
                 move_data["user_id"]
@@ -1,6 +1,6 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from services.tutor_service import tutor_service
 
 router = APIRouter()
@@ -8,6 +8,7 @@ router = APIRouter()
 class PuzzleRequest(BaseModel):
     user_id: str
     user_rating: int
+    theme: Optional[str] = None
 
 class PuzzleSolutionRequest(BaseModel):
     puzzle_id: str
@@ -15,32 +16,42 @@ class PuzzleSolutionRequest(BaseModel):
     user_id: str
 
 class HintRequest(BaseModel):
-    fen: str
-    puzzle_solution: List[str]
-    hint_level: int
+    puzzle_id: Optional[str] = None
+    user_moves: List[str] = []  # Solver's moves played so far
+    hint_level: int = 1
+    # Deprecated: clients that predate puzzle_id send the position and solution instead
+    fen: Optional[str] = None
+    solution: Optional[List[str]] = None
+
+def _get_puzzle(puzzle_id: str) -> Dict[str, Any]:
+    puzzle = tutor_service.puzzle_gen.get_puzzle(puzzle_id)
+    if puzzle is None:
+        raise HTTPException(status_code=404, detail="Puzzle not found")
+    return puzzle
 
 @router.post("/generate")
 async def generate_puzzle(request: PuzzleRequest):
     """Generate an adaptive puzzle for the user"""
-    return tutor_service.generate_adaptive_puzzle(request.user_id, request.user_rating)
+    return await tutor_service.generate_adaptive_puzzle(request.user_id, request.user_rating, request.theme)
 
 @router.post("/validate")
 async def validate_puzzle_solution(request: PuzzleSolutionRequest):
-    """Validate a puzzle solution"""
-    # In a full implementation, you'd retrieve the puzzle from database
-    # For now, we'll use a simplified validation
-    from services.puzzle_gen import puzzle_generator
-    
-    # This is a simplified validation - in practice, you'd look up the puzzle
-    result = puzzle_generator.validate_puzzle_solution(
-        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",  # Default start
-        request.user_moves,
-        ["e2e4"]  # Default solution
-    )
-    
-    return result
+    """Validate the moves played so far; a lookup in the puzzle's response tree"""
+    puzzle = _get_puzzle(request.puzzle_id)
+    return tutor_service.puzzle_gen.validate_puzzle_solution(puzzle, request.user_moves)
 
 @router.post("/hint")
 async def get_hint(request: HintRequest):
-    """Get a hint for the current puzzle"""
-    return tutor_service.provide_hint(request.fen, request.puzzle_solution, request.hint_level)
+    """Get a hint for the next move of the puzzle"""
+    if request.puzzle_id is None:
+        if not request.fen or not request.solution:
+            raise HTTPException(status_code=422, detail="puzzle_id is required")
+        return tutor_service.provide_hint(request.fen, request.solution, request.hint_level)
+    
+    puzzle = _get_puzzle(request.puzzle_id)
+    step = len(request.user_moves)
+    if step >= len(puzzle["tree"]):
+        raise HTTPException(status_code=400, detail="Puzzle already complete")
+    
+    node = puzzle["tree"][step]
+    return tutor_service.provide_hint(node["fen"], [node["best"]], request.hint_level)
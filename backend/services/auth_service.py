@@ -1,43 +1,78 @@
 import bcrypt
 import jwt
+import os
 from datetime import datetime, timedelta
-from database.models import User
+from typing import Optional, Union, Dict, Any
+from database.models import User, Principal
 from database.db_client import db_client
+from cache.cache_manager import TTLCache
+from services.executor import password_executor, run_on
 
 class AuthService:
     def __init__(self):
         self.secret_key = "your-secret-key"  # In production, use env var
-        self.collection = db_client.get_collection("users")
+        # bcrypt work factor; existing hashes with another cost are upgraded on login
+        self.bcrypt_rounds = int(os.getenv("BCRYPT_ROUNDS", 12))
+        # Verified users by user_id, so authenticated requests skip the users lookup
+        self.principal_ttl = int(os.getenv("AUTH_CACHE_TTL", 60))
+        self.principals = TTLCache(max_entries=int(os.getenv("AUTH_CACHE_SIZE", 10000)))
+        # Build the principal from the token's signed claims alone (no lookup at all);
+        # a deleted user's token then stays valid until it expires
+        self.trust_claims = os.getenv("AUTH_TRUST_CLAIMS", "false").lower() == "true"
     
-    def hash_password(self, password: str) -> str:
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    @property
+    def collection(self):
+        return db_client.get_async_collection("users")
     
-    def verify_password(self, password: str, hashed: str) -> bool:
+    def _hash_password(self, password: str) -> str:
+        salt = bcrypt.gensalt(rounds=self.bcrypt_rounds)
+        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    
+    def _verify_password(self, password: str, hashed: str) -> bool:
         return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
     
-    def create_user(self, username: str, email: str, password: str) -> User:
-        if self.collection.find_one({"$or": [{"username": username}, {"email": email}]}):
+    # bcrypt takes hundreds of milliseconds; keep it off the event loop
+    async def hash_password(self, password: str) -> str:
+        return await run_on(password_executor, self._hash_password, password)
+    
+    async def verify_password(self, password: str, hashed: str) -> bool:
+        return await run_on(password_executor, self._verify_password, password, hashed)
+    
+    def needs_rehash(self, hashed: str) -> bool:
+        # Hashes look like $2b$<cost>$<salt+digest>
+        try:
+            return int(hashed.split("$")[2]) != self.bcrypt_rounds
+        except (IndexError, ValueError):
+            return True
+    
+    async def create_user(self, username: str, email: str, password: str) -> User:
+        if await self.collection.find_one({"$or": [{"username": username}, {"email": email}]}):
             raise ValueError("User already exists")
         
         user = User(
             user_id=f"user_{datetime.now().timestamp()}",
             username=username,
             email=email,
-            password_hash=self.hash_password(password)
+            password_hash=await self.hash_password(password)
         )
         
-        self.collection.insert_one(user.dict())
+        await self.collection.insert_one(user.dict())
         return user
     
-    def authenticate_user(self, email: str, password: str) -> Optional[User]:
-        user_data = self.collection.find_one({"email": email})
+    async def authenticate_user(self, email: str, password: str) -> Optional[User]:
+        user_data = await self.collection.find_one({"email": email})
         if not user_data:
             return None
         
         user = User(**user_data)
-        if self.verify_password(password, user.password_hash):
-            return user
-        return None
+        if not await self.verify_password(password, user.password_hash):
+            return None
+        
+        if self.needs_rehash(user.password_hash):
+            # The password is known to be correct here, so re-hash it at the configured cost
+            user.password_hash = await self.hash_password(password)
+            await self.update_user(user.user_id, {"password_hash": user.password_hash})
+        return user
     
     def create_token(self, user: User) -> str:
         payload = {
@@ -47,12 +82,34 @@ class AuthService:
         }
         return jwt.encode(payload, self.secret_key, algorithm="HS256")
     
-    def verify_token(self, token: str) -> Optional[User]:
+    async def verify_token(self, token: str) -> Optional[Union[User, Principal]]:
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=["HS256"])
-            user_data = self.collection.find_one({"user_id": payload["user_id"]})
-            return User(**user_data) if user_data else None
         except jwt.PyJWTError:
             return None
+        
+        if self.trust_claims:
+            return Principal(user_id=payload["user_id"], username=payload["username"])
+        return await self.get_user(payload["user_id"])
+    
+    async def get_user(self, user_id: str) -> Optional[User]:
+        cached = self.principals.get(user_id)
+        if cached is not None:
+            return User(**cached)
+        
+        user_data = await self.collection.find_one({"user_id": user_id})
+        if not user_data:
+            return None
+        user = User(**user_data)
+        self.principals.set(user_id, user.model_dump(mode="json"), expire_seconds=self.principal_ttl)
+        return user
+    
+    async def update_user(self, user_id: str, fields: Dict[str, Any]):
+        await self.collection.update_one({"user_id": user_id}, {"$set": fields})
+        self.invalidate_user(user_id)
+    
+    def invalidate_user(self, user_id: str):
+        """Drop a cached principal; other worker processes catch up within AUTH_CACHE_TTL"""
+        self.principals.delete(user_id)
 
 auth_service = AuthService()
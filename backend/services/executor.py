@@ -0,0 +1,27 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# Bounded pool for blocking work (engine searches, CPU-bound helpers) so it
+# never runs on the event loop thread and can't spawn unbounded threads.
+blocking_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("BLOCKING_WORKERS") or 0) or (os.cpu_count() or 1) * 2 + 4,
+    thread_name_prefix="blocking"
+)
+
+# Separate pool for password hashing so a burst of logins can't starve engine
+# work; its size is the cap on concurrent bcrypt computations.
+password_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PASSWORD_HASH_WORKERS") or 0) or max(1, (os.cpu_count() or 1) // 2),
+    thread_name_prefix="bcrypt"
+)
+
+async def run_on(executor, func, *args, **kwargs):
+    """Run a synchronous callable on the given executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a synchronous callable on the bounded executor and await its result"""
+    return await run_on(blocking_executor, func, *args, **kwargs)
@@ -0,0 +1,164 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from services.tutor_service import tutor_service
+
+# Lower value is served first
+PRIORITY_USER_MOVE = 0
+PRIORITY_ENGINE_MOVE = 1
+
+class ExplanationJob:
+    def __init__(self, game_id: str, ply: int, fen: str, move: str, best_move: str,
+                 priority: int = PRIORITY_USER_MOVE):
+        self.game_id = game_id
+        self.ply = ply
+        self.fen = fen
+        self.move = move
+        self.best_move = best_move
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        return (self.game_id, self.ply)
+
+class ExplanationQueue:
+    """Bounded background queue that fills in deferred LLM explanations.
+
+    Jobs are keyed by (game_id, ply): re-enqueueing the same ply replaces the
+    pending job instead of duplicating it. When the queue is full the least
+    urgent job (engine moves first, then the oldest) is dropped, and jobs
+    that waited longer than ``max_age`` are discarded unprocessed. Evicted,
+    expired and failed jobs get a terminal ``explanation_status``
+    (``dropped`` or ``failed``) so their ply doesn't stay ``pending``; a
+    rejected new job is reported to the caller instead.
+    """
+
+    def __init__(self, max_size: int = None, workers: int = None, max_age: float = None):
+        self.max_size = max_size or int(os.getenv("EXPLANATION_QUEUE_SIZE", 256))
+        self.workers = workers or int(os.getenv("EXPLANATION_WORKERS", 2))
+        self.max_age = max_age or float(os.getenv("EXPLANATION_JOB_MAX_AGE", 600))
+
+        self._pending: Dict[Tuple[str, int], ExplanationJob] = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._available: Optional[asyncio.Condition] = None
+        self._tasks = []
+        self._in_flight = set()
+        self._status_writes = set()
+
+        self.processed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.failed = 0
+
+    def start(self):
+        if self._tasks:
+            return
+        self._available = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.gather(*self._status_writes, return_exceptions=True)
+
+    def is_queued(self, game_id: str, ply: int) -> bool:
+        """Whether a job for this ply is waiting or being processed"""
+        return (game_id, ply) in self._pending or (game_id, ply) in self._in_flight
+
+    def _finish(self, job: ExplanationJob, status: str):
+        """Record a terminal status for a job that won't produce an explanation"""
+        task = asyncio.create_task(self._write_status(job, status))
+        self._status_writes.add(task)
+        task.add_done_callback(self._status_writes.discard)
+
+    async def _write_status(self, job: ExplanationJob, status: str):
+        from services.game_service import game_service
+
+        try:
+            await game_service.update_analysis(job.game_id, job.ply, {"explanation_status": status})
+        except Exception as e:
+            print(f"Could not mark explanation for {job.game_id} ply {job.ply} {status}: {e}")
+
+    async def enqueue(self, job: ExplanationJob) -> bool:
+        """Queue a job; returns False if it was dropped because the queue is full"""
+        if not self._tasks:
+            self.start()
+
+        async with self._available:
+            if job.key in self._pending:
+                self.coalesced += 1
+            elif len(self._pending) >= self.max_size:
+                worst = max(self._pending.values(), key=lambda j: (j.priority, -j.enqueued_at))
+                if (worst.priority, -worst.enqueued_at) < (job.priority, -job.enqueued_at):
+                    self.dropped += 1
+                    return False
+                del self._pending[worst.key]
+                self.dropped += 1
+                self._finish(worst, "dropped")
+
+            self._pending[job.key] = job
+            heapq.heappush(self._heap, (job.priority, next(self._counter), job))
+            self._available.notify()
+        return True
+
+    async def _next_job(self) -> ExplanationJob:
+        async with self._available:
+            while True:
+                while self._heap:
+                    _, _, job = heapq.heappop(self._heap)
+                    # Skip heap entries superseded by a coalesced or evicted job
+                    if self._pending.get(job.key) is not job:
+                        continue
+                    del self._pending[job.key]
+                    if time.monotonic() - job.enqueued_at > self.max_age:
+                        self.dropped += 1
+                        self._finish(job, "dropped")
+                        continue
+                    self._in_flight.add(job.key)
+                    return job
+                await self._available.wait()
+
+    async def _worker(self):
+        while True:
+            job = await self._next_job()
+            try:
+                await self._process(job)
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                print(f"Explanation job for {job.game_id} ply {job.ply} failed: {e}")
+                self._finish(job, "failed")
+            finally:
+                self._in_flight.discard(job.key)
+
+    async def _process(self, job: ExplanationJob):
+        # Imported here because game_service enqueues jobs on this module's queue
+        from services.game_service import game_service
+        
+        texts = await tutor_service.explain(job.fen, job.move, job.best_move)
+        await game_service.update_analysis(
+            job.game_id, job.ply, {**texts, "explanation_status": "ready"}
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "max_size": self.max_size,
+            "workers": len(self._tasks),
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "failed": self.failed
+        }
+
+explanation_queue = ExplanationQueue()
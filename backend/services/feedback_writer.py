@@ -0,0 +1,119 @@
+import asyncio
+import os
+from typing import Any, Dict, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+from database.db_client import db_client
+
+class FeedbackWriter:
+    """Buffers feedback events and writes them with unordered ``insert_many``.
+
+    A batch is flushed once ``batch_size`` events are buffered or every
+    ``flush_interval`` seconds. When ``max_buffered`` events are waiting,
+    ``submit`` blocks for up to ``enqueue_timeout`` seconds and then rejects
+    the events so callers can ask clients to retry. Buffered events are
+    flushed on shutdown but are lost if the process crashes.
+    """
+
+    def __init__(self, batch_size: int = None, flush_interval: float = None,
+                 max_buffered: int = None, enqueue_timeout: float = None):
+        self.batch_size = batch_size or int(os.getenv("FEEDBACK_BATCH_SIZE", 500))
+        self.flush_interval = flush_interval or float(os.getenv("FEEDBACK_FLUSH_INTERVAL", 1))
+        self.max_buffered = max_buffered or int(os.getenv("FEEDBACK_MAX_BUFFERED", 10000))
+        self.enqueue_timeout = enqueue_timeout or float(os.getenv("FEEDBACK_ENQUEUE_TIMEOUT", 2))
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._space: Optional[asyncio.Condition] = None
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self):
+        if self._flusher is not None:
+            return
+        self._space = asyncio.Condition()
+        self._batch_ready = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+            await self.flush()
+
+    async def submit(self, docs: List[Dict[str, Any]]) -> bool:
+        """Buffer events; returns False if the buffer stayed full past the timeout"""
+        if self._flusher is None:
+            self.start()
+
+        async with self._space:
+            # An oversized request is still let through once the buffer has drained
+            has_room = lambda: not self._buffer or len(self._buffer) + len(docs) <= self.max_buffered
+            try:
+                await asyncio.wait_for(self._space.wait_for(has_room), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += len(docs)
+                return False
+
+            self._buffer.extend(docs)
+            self.accepted += len(docs)
+            if len(self._buffer) >= self.batch_size:
+                self._batch_ready.set()
+        return True
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                try:
+                    await self._write(batch)
+                except Exception as e:
+                    # Keep the events buffered and retry on the next flush
+                    print(f"Failed to write {len(batch)} feedback events: {e}")
+                    return
+
+                async with self._space:
+                    del self._buffer[:len(batch)]
+                    self._space.notify_all()
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        collection = db_client.get_async_collection("feedback")
+        try:
+            result = await collection.insert_many(batch, ordered=False)
+            self.written += len(result.inserted_ids)
+        except BulkWriteError as e:
+            # Unordered: everything except the rejected documents was inserted
+            self.written += e.details.get("nInserted", 0)
+            self.failed += len(e.details.get("writeErrors", []))
+        self.batches += 1
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "max_buffered": self.max_buffered,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches
+        }
+
+feedback_writer = FeedbackWriter()
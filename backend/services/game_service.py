@@ -1,16 +1,62 @@
 from datetime import datetime
 from database.models import Game, GameType
 from database.db_client import db_client
+from database.game_codec import (
+    build_ply_update, checkpoint_interval, compact_analysis, decode_game, encode_game,
+    position_at, replay_positions, restore_analysis_fens, CHECKPOINT_INTERVAL, HELPER_FIELDS,
+    STORAGE_VERSION
+)
 from services.stockfish_service import stockfish_service
 from services.tutor_service import tutor_service
+from services.executor import run_blocking
+from services.explanation_queue import explanation_queue, ExplanationJob, PRIORITY_USER_MOVE
+from services.game_sessions import GameSessionStore
+from typing import List, Tuple
+import base64
 import chess
+import json
+import os
+
+# Returned by get_user_games unless specific fields are requested
+SUMMARY_FIELDS = [
+    "game_id", "user_id", "game_type", "white_player", "black_player",
+    "stockfish_level", "result", "started_at", "ended_at"
+]
+PLY_FIELDS = {"moves", "positions", "analysis"}
+MAX_PAGE_SIZE = 100
+
+def encode_page_cursor(started_at: datetime, game_id: str) -> str:
+    raw = json.dumps({"started_at": started_at.isoformat(), "game_id": game_id})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_page_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(raw["started_at"]), raw["game_id"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
 
 class GameService:
     def __init__(self):
-        self.games_collection = db_client.get_collection("games")
+        # Optionally keep per-ply analysis (with its long LLM texts) out of the game document
+        self.separate_analysis = os.getenv("GAME_ANALYSIS_COLLECTION", "false").lower() == "true"
+        self.defer_explanations = os.getenv("DEFER_EXPLANATIONS", "false").lower() == "true"
+        self.sessions = GameSessionStore(loader=self._load_session_game, writer=self._append_plies)
     
-    def create_game(self, user_id: str, game_type: str, 
-                   white_player: str, black_player: str, stockfish_level: int = None) -> Game:
+    # Resolved per use so importing the service doesn't create a database client
+    @property
+    def games_collection(self):
+        return db_client.get_async_collection("games")
+    
+    @property
+    def analysis_collection(self):
+        return db_client.get_async_collection("game_analysis")
+    
+    async def create_game(self, user_id: str, game_type: str, 
+                   white_player: str, black_player: str, stockfish_level: int = None,
+                   defer_explanations: bool = None) -> Game:
+        if defer_explanations is None:
+            defer_explanations = self.defer_explanations
         game = Game(
             game_id=f"game_{datetime.now().timestamp()}",
             user_id=user_id,
@@ -21,85 +67,315 @@ class GameService:
             positions=["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"],
             moves=[],
             analysis=[],
+            defer_explanations=defer_explanations,
             started_at=datetime.now()
         )
         
-        self.games_collection.insert_one(game.dict())
+        await self.games_collection.insert_one(encode_game(game))
+        await self.sessions.add(game)
         return game
     
-    def make_move(self, game_id: str, move: str, user_id: str) -> dict:
-        game_data = self.games_collection.find_one({"game_id": game_id})
-        if not game_data:
-            raise ValueError("Game not found")
-        
-        game = Game(**game_data)
-        current_fen = game.positions[-1]
+    async def make_move(self, game_id: str, move: str, user_id: str) -> dict:
+        session = await self.sessions.get(game_id)
         
-        print(f"🎯 Processing move {move} in game {game_id}")
+        # Per-game lock keeps concurrent requests for one game in order
+        async with session.lock:
+            game = session.game
+            board = session.board
+            
+            try:
+                chess_move = chess.Move.from_uci(move)
+            except ValueError:
+                return {"valid": False, "error": "Invalid move notation"}
+            if chess_move not in board.legal_moves:
+                return {"valid": False, "error": "Illegal move"}
+            
+            current_fen = board.fen()
+            
+            print(f"🎯 Processing move {move} in game {game_id}")
+            
+            # Analyze the move with tutor service
+            explain = not game.defer_explanations
+            analysis = await tutor_service.analyze_move(current_fen, move, user_id, explain=explain)
+            if not analysis["valid"]:
+                return {"valid": False, "error": analysis["error"]}
+            
+            # Update game state
+            board.push(chess_move)
+            game.moves.append(move)
+            game.positions.append(analysis["new_fen"])
+            game.analysis.append(analysis)
+            deferred = []
+            if not explain:
+                deferred.append(ExplanationJob(
+                    game_id, len(game.analysis) - 1, current_fen, move,
+                    analysis["best_move"], PRIORITY_USER_MOVE
+                ))
+            
+            # If playing vs Stockfish, get AI response
+            stockfish_move = None
+            if game.game_type == GameType.VS_STOCKFISH and game.stockfish_level:
+                if not board.is_game_over():
+                    # Determine whose turn it is
+                    is_white_turn = board.turn == chess.WHITE
+                    should_stockfish_move = (
+                        (is_white_turn and game.white_player == "stockfish") or
+                        (not is_white_turn and game.black_player == "stockfish")
+                    )
+                    
+                    if should_stockfish_move:
+                        print(f"🤖 Stockfish thinking (level {game.stockfish_level})...")
+                        played = await run_blocking(
+                            stockfish_service.play, analysis["new_fen"], game.stockfish_level
+                        )
+                        stockfish_move = played["move"]
+                        print(f"🤖 Stockfish plays: {stockfish_move}")
+                        
+                        # Engine moves aren't tutored inline; see analyze_ply for opt-in tutoring
+                        board.push_uci(stockfish_move)
+                        game.moves.append(stockfish_move)
+                        game.positions.append(played["new_fen"])
+                        game.analysis.append({
+                            "valid": True,
+                            "engine_move": True,
+                            "new_fen": played["new_fen"],
+                            "evaluation": played["evaluation"],
+                            "explanation_status": "not_requested"
+                        })
+            
+            # Check if game is over
+            game_over = board.is_game_over()
+            result_fields = {}
+            if game_over:
+                game.result = board.result()
+                game.ended_at = datetime.now()
+                result_fields = {"result": game.result, "ended_at": game.ended_at}
+            
+            # Write-behind: persisted in batches, immediately once the game ends
+            await self.sessions.record(session, result_fields)
+            
+            for job in deferred:
+                if not await explanation_queue.enqueue(job):
+                    await self.update_analysis(job.game_id, job.ply, {"explanation_status": "dropped"})
+            
+            return {
+                "valid": True,
+                "game": game.dict(),
+                "last_analysis": analysis,
+                "stockfish_move": stockfish_move,
+                "game_over": game_over,
+                "result": game.result
+            }
+    
+    async def _append_plies(self, game_id: str, start_ply: int, moves: list, positions: list,
+                            analysis: list, result_fields: dict = None):
+        # Matching on the current length turns a concurrent move into a failed update
+        # instead of interleaved plies
+        result = await self.games_collection.update_one(
+            {"game_id": game_id, "moves": {"$size": start_ply}},
+            build_ply_update(
+                start_ply, moves, positions, analysis, result_fields,
+                include_analysis=not self.separate_analysis
+            )
+        )
+        if result.matched_count == 0:
+            raise ValueError("Game was modified by another move, please retry")
         
-        # Analyze the move with tutor service
-        analysis = tutor_service.analyze_move(current_fen, move, user_id)
-        if not analysis["valid"]:
-            return {"valid": False, "error": analysis["error"]}
+        if self.separate_analysis and analysis:
+            await self.analysis_collection.insert_many([
+                {"game_id": game_id, "ply": start_ply + i, **compact_analysis(entry)}
+                for i, entry in enumerate(analysis)
+            ])
+    
+    async def update_analysis(self, game_id: str, ply: int, fields: dict, replace: bool = False):
+        """Update one ply's analysis entry wherever analysis is stored"""
+        session = self.sessions.peek(game_id)
+        if session is not None and ply < len(session.game.analysis):
+            if replace:
+                session.game.analysis[ply] = fields
+            else:
+                session.game.analysis[ply].update(fields)
+            if ply >= session.flushed_ply:
+                # Not in MongoDB yet; the next flush writes the updated entry
+                return
         
-        # Update game state
-        game.moves.append(move)
-        game.positions.append(analysis["new_fen"])
-        game.analysis.append(analysis)
+        if replace:
+            fields = compact_analysis(fields)
         
-        # If playing vs Stockfish, get AI response
-        stockfish_move = None
-        if game.game_type == GameType.VS_STOCKFISH and game.stockfish_level:
-            board = chess.Board(analysis["new_fen"])
-            if not board.is_game_over():
-                # Determine whose turn it is
-                is_white_turn = len(game.moves) % 2 == 0
-                should_stockfish_move = (
-                    (is_white_turn and game.white_player == "stockfish") or
-                    (not is_white_turn and game.black_player == "stockfish")
+        if self.separate_analysis:
+            if replace:
+                await self.analysis_collection.replace_one(
+                    {"game_id": game_id, "ply": ply},
+                    {"game_id": game_id, "ply": ply, **fields},
+                    upsert=True
                 )
-                
-                if should_stockfish_move:
-                    print(f"🤖 Stockfish thinking (level {game.stockfish_level})...")
-                    stockfish_move = stockfish_service.get_move(analysis["new_fen"], game.stockfish_level)
-                    print(f"🤖 Stockfish plays: {stockfish_move}")
-                    
-                    stockfish_analysis = tutor_service.analyze_move(
-                        analysis["new_fen"], stockfish_move, "stockfish"
-                    )
-                    
-                    game.moves.append(stockfish_move)
-                    game.positions.append(stockfish_analysis["new_fen"])
-                    game.analysis.append(stockfish_analysis)
+            else:
+                await self.analysis_collection.update_one(
+                    {"game_id": game_id, "ply": ply}, {"$set": fields}
+                )
+        elif replace:
+            await self.games_collection.update_one(
+                {"game_id": game_id}, {"$set": {f"analysis.{ply}": fields}}
+            )
+        else:
+            await self.games_collection.update_one(
+                {"game_id": game_id},
+                {"$set": {f"analysis.{ply}.{key}": value for key, value in fields.items()}}
+            )
+    
+    async def _load_analysis(self, game: Game):
+        if not self.separate_analysis:
+            return
+        cursor = self.analysis_collection.find({"game_id": game.game_id}, {"_id": 0}).sort("ply", 1)
+        entries = await cursor.to_list(length=None)
+        for entry in entries:
+            entry.pop("game_id", None)
+            entry.pop("ply", None)
+        if entries:
+            game.analysis = entries
+            restore_analysis_fens(game)
+    
+    async def get_explanation(self, game_id: str, ply: int) -> dict:
+        """Explanation for one ply, ``pending`` until its background job has run
+
+        Ends as ``dropped`` or ``failed`` if the job never produced one
+        (request it again with analyze_ply).
+        """
+        game, fen = await self._game_at(game_id, ply)
+        entry = game.analysis[ply]
+        if entry.get("explanation_status") == "pending" and not explanation_queue.is_queued(game_id, ply):
+            # Its job was lost, e.g. in a restart; queue it again
+            job = ExplanationJob(game_id, ply, fen, game.moves[ply],
+                                 entry.get("best_move"), PRIORITY_USER_MOVE)
+            if not await explanation_queue.enqueue(job):
+                await self.update_analysis(game_id, ply, {"explanation_status": "dropped"})
+                entry["explanation_status"] = "dropped"
+        return {
+            "ply": ply,
+            "move": game.moves[ply],
+            "status": entry.get("explanation_status", "ready"),
+            "explanation": entry.get("explanation", ""),
+            "improvement_suggestion": entry.get("improvement_suggestion", "")
+        }
+    
+    async def analyze_ply(self, game_id: str, ply: int) -> dict:
+        """Run full tutoring for a stored ply on request, e.g. an engine reply"""
+        game, fen = await self._game_at(game_id, ply)
+        analysis = await tutor_service.tutor_move(fen, game.moves[ply])
+        if game.analysis[ply].get("engine_move"):
+            analysis["engine_move"] = True
+        
+        await self.update_analysis(game_id, ply, analysis, replace=True)
+        return analysis
+    
+    async def get_user_games(self, user_id: str, limit: int = 20, cursor: str = None,
+                             fields: List[str] = None) -> dict:
+        """One page of a user's games, newest first
+
+        Returns summaries without the per-ply arrays unless ``fields`` asks for
+        them. Pass the returned ``next_cursor`` to fetch the following page.
+        """
+        selected = list(fields) if fields else list(SUMMARY_FIELDS)
+        unknown = set(selected) - set(Game.model_fields)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
         
-        # Check if game is over
-        final_board = chess.Board(game.positions[-1])
-        if final_board.is_game_over():
-            game.result = final_board.result()
-            game.ended_at = datetime.now()
+        # Make sure plies still held in live sessions are part of the listing
+        await self.sessions.flush_all(user_id)
         
-        self.games_collection.update_one(
-            {"game_id": game_id},
-            {"$set": game.dict()}
+        projection = {"_id": 0, "game_id": 1, "started_at": 1}
+        projection.update({field: 1 for field in selected})
+        if "positions" in selected:
+            # Compact documents rebuild positions from their moves
+            projection.update({"moves": 1, "start_fen": 1, "storage_version": 1})
+        if not PLY_FIELDS & set(selected):
+            projection["move_count"] = {"$size": {"$ifNull": ["$moves", []]}}
+        
+        query = {"user_id": user_id}
+        if cursor:
+            started_at, game_id = decode_page_cursor(cursor)
+            query["$or"] = [
+                {"started_at": {"$lt": started_at}},
+                {"started_at": started_at, "game_id": {"$lt": game_id}}
+            ]
+        
+        docs = await (
+            self.games_collection.find(query, projection)
+            .sort([("started_at", -1), ("game_id", -1)])
+            .limit(limit + 1)
+            .to_list(length=limit + 1)
         )
         
-        return {
-            "valid": True,
-            "game": game.dict(),
-            "last_analysis": analysis,
-            "stockfish_move": stockfish_move,
-            "game_over": final_board.is_game_over(),
-            "result": game.result
-        }
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_cursor = encode_page_cursor(docs[-1]["started_at"], docs[-1]["game_id"])
+        
+        for doc in docs:
+            if "positions" in selected and doc.get("storage_version", 1) >= STORAGE_VERSION:
+                doc["positions"] = replay_positions(doc.get("start_fen"), doc.get("moves", []))
+            for helper in HELPER_FIELDS:
+                doc.pop(helper, None)
+            if "moves" not in selected:
+                doc.pop("moves", None)
+        
+        return {"games": docs, "next_cursor": next_cursor}
+    
+    async def get_game(self, game_id: str) -> Game:
+        session = self.sessions.peek(game_id)
+        if session is not None:
+            return session.game
+        return await self._load_game(game_id)
+    
+    async def _load_game(self, game_id: str, with_positions: bool = True) -> Game:
+        game_data = await self.games_collection.find_one({"game_id": game_id})
+        if not game_data:
+            raise ValueError("Game not found")
+        game = decode_game(game_data, with_positions=with_positions)
+        await self._load_analysis(game)
+        return game
     
-    def get_user_games(self, user_id: str):
-        games_data = self.games_collection.find({"user_id": user_id}).sort("started_at", -1)
-        return [Game(**game) for game in games_data]
+    async def _game_at(self, game_id: str, ply: int) -> Tuple[Game, str]:
+        """Game without replayed positions, plus the FEN before ``ply``
+
+        The FEN is replayed from the nearest stored checkpoint, so looking at
+        one ply of a long stored game doesn't rebuild every position.
+        """
+        session = self.sessions.peek(game_id)
+        if session is not None:
+            game = session.game
+        else:
+            game_data = await self.games_collection.find_one({"game_id": game_id})
+            if not game_data:
+                raise ValueError("Game not found")
+            game = decode_game(game_data, with_positions=False)
+            await self._load_analysis(game)
+        
+        if ply < 0 or ply >= len(game.moves) or ply >= len(game.analysis):
+            raise ValueError("Ply not found")
+        if session is not None:
+            return game, game.positions[ply]
+        return game, position_at(game_data, ply)
     
-    def get_game(self, game_id: str) -> Game:
-        game_data = self.games_collection.find_one({"game_id": game_id})
+    async def _load_session_game(self, game_id: str) -> Game:
+        """Loader for live sessions, which rebuild positions while replaying the moves"""
+        game_data = await self.games_collection.find_one({"game_id": game_id})
         if not game_data:
             raise ValueError("Game not found")
-        return Game(**game_data)
+        
+        if (game_data.get("storage_version", 1) < STORAGE_VERSION
+                or checkpoint_interval(game_data) != CHECKPOINT_INTERVAL):
+            # Upgrade legacy documents, and ones checkpointed at another interval, on first
+            # write access so plies can be appended compactly
+            game = decode_game(game_data)
+            await self.games_collection.replace_one(
+                {"_id": game_data["_id"], "moves": {"$size": len(game.moves)}},
+                encode_game(game)
+            )
+        else:
+            game = decode_game(game_data, with_positions=False)
+        await self._load_analysis(game)
+        return game
 
 game_service = GameService()
@@ -0,0 +1,188 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Any, Optional
+
+import chess
+
+from database.models import Game
+from database.game_codec import restore_analysis_fens
+
+class GameSession:
+    """Live state of one game: the model, its board and the plies not yet in MongoDB"""
+
+    def __init__(self, game: Game):
+        self.game = game
+        self.board = chess.Board(game.positions[0]) if game.positions else chess.Board()
+        # Compact games arrive with only their start position; rebuild the rest during replay
+        rebuild = len(game.positions) != len(game.moves) + 1
+        if rebuild:
+            game.positions = [self.board.fen()]
+        for move in game.moves:
+            self.board.push_uci(move)
+            if rebuild:
+                game.positions.append(self.board.fen())
+        if rebuild:
+            restore_analysis_fens(game)
+        self.lock = asyncio.Lock()
+        self.flushed_ply = len(game.moves)
+        self.result_fields: Dict[str, Any] = {}
+        self.dirty_since: Optional[float] = None
+
+    @property
+    def dirty(self) -> bool:
+        return len(self.game.moves) > self.flushed_ply or bool(self.result_fields)
+
+class GameSessionStore:
+    """LRU of live games with batched write-behind to MongoDB.
+
+    Moves are applied to the in-memory session under a per-game lock and
+    persisted once ``flush_plies`` plies are pending, after ``flush_interval``
+    seconds, when the game ends, on eviction and on shutdown. A crash can
+    therefore lose at most that many plies or seconds of a game. Finished
+    games leave the LRU as soon as their final flush lands.
+    """
+
+    def __init__(self, loader: Callable[[str], Awaitable[Game]],
+                 writer: Callable[..., Awaitable[None]],
+                 max_sessions: int = None, flush_plies: int = None, flush_interval: float = None):
+        self.loader = loader
+        self.writer = writer
+        self.max_sessions = max_sessions or int(os.getenv("GAME_SESSION_CACHE_SIZE", 1000))
+        self.flush_plies = flush_plies or int(os.getenv("GAME_FLUSH_PLIES", 8))
+        self.flush_interval = flush_interval or float(os.getenv("GAME_FLUSH_INTERVAL", 5))
+
+        self._sessions: "OrderedDict[str, GameSession]" = OrderedDict()
+        self._flusher: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.loads = 0
+        self.flushes = 0
+        self.evictions = 0
+
+    def start(self):
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush_all()
+
+    def peek(self, game_id: str) -> Optional[GameSession]:
+        return self._sessions.get(game_id)
+
+    async def add(self, game: Game) -> GameSession:
+        session = GameSession(game)
+        self._sessions[game.game_id] = session
+        await self._evict(keep=game.game_id)
+        return session
+
+    async def get(self, game_id: str) -> GameSession:
+        session = self._sessions.get(game_id)
+        if session is not None:
+            self._sessions.move_to_end(game_id)
+            self.hits += 1
+            return session
+
+        game = await self.loader(game_id)
+        # Another request may have loaded the game while we awaited
+        session = self._sessions.get(game_id)
+        if session is None:
+            session = await self.add(game)
+            self.loads += 1
+        return session
+
+    async def record(self, session: GameSession, result_fields: Dict[str, Any] = None):
+        """Note new plies on a session (caller holds its lock) and flush if a bound is hit"""
+        if result_fields:
+            session.result_fields.update(result_fields)
+        if session.dirty_since is None:
+            session.dirty_since = time.monotonic()
+
+        pending = len(session.game.moves) - session.flushed_ply
+        if pending >= self.flush_plies or session.result_fields:
+            await self._flush_locked(session)
+        if session.game.ended_at is not None and not session.dirty:
+            self._drop(session)
+
+    def _drop(self, session: GameSession):
+        if self._sessions.get(session.game.game_id) is session:
+            del self._sessions[session.game.game_id]
+
+    async def _flush_locked(self, session: GameSession):
+        if not session.dirty:
+            return
+        game = session.game
+        start = session.flushed_ply
+        end = len(game.moves)
+        try:
+            await self.writer(
+                game.game_id, start,
+                game.moves[start:end], game.positions[start + 1:end + 1], game.analysis[start:end],
+                session.result_fields
+            )
+        except ValueError as e:
+            # Stored game diverged (e.g. written by another worker); reload it next time
+            print(f"Dropping stale session for {game.game_id}: {e}")
+            self._sessions.pop(game.game_id, None)
+            raise
+        session.flushed_ply = end
+        session.result_fields = {}
+        session.dirty_since = None
+        self.flushes += 1
+
+    async def flush(self, session: GameSession):
+        async with session.lock:
+            await self._flush_locked(session)
+
+    async def flush_all(self, user_id: str = None):
+        for session in list(self._sessions.values()):
+            if session.dirty and (user_id is None or session.game.user_id == user_id):
+                try:
+                    await self.flush(session)
+                except Exception as e:
+                    print(f"Failed to flush game {session.game.game_id}: {e}")
+
+    async def _evict(self, keep: str = None):
+        for game_id in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            session = self._sessions.get(game_id)
+            if session is None or game_id == keep or session.lock.locked():
+                # In use; try the next least recently used one
+                continue
+            try:
+                await self.flush(session)
+            except Exception as e:
+                print(f"Failed to flush evicted game {game_id}: {e}")
+                continue
+            if session.lock.locked() or session.dirty:
+                # Picked up again while flushing
+                continue
+            self._drop(session)
+            self.evictions += 1
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            now = time.monotonic()
+            for session in list(self._sessions.values()):
+                if session.dirty_since is not None and now - session.dirty_since >= self.flush_interval:
+                    try:
+                        await self.flush(session)
+                    except Exception as e:
+                        print(f"Failed to flush game {session.game.game_id}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "dirty": sum(1 for session in self._sessions.values() if session.dirty),
+            "hits": self.hits,
+            "loads": self.loads,
+            "flushes": self.flushes,
+            "evictions": self.evictions
+        }
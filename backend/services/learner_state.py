@@ -0,0 +1,174 @@
+import asyncio
+import os
+import struct
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from database.db_client import db_client
+
+# accuracy, response_time, difficulty_level, improvement_rate, puzzle_streak, total_attempts, correct_attempts
+RECORD = struct.Struct("<4f3I")
+FIELDS = (
+    "accuracy", "response_time", "difficulty_level", "improvement_rate",
+    "puzzle_streak", "total_attempts", "correct_attempts"
+)
+DEFAULTS = {
+    "accuracy": 0.5,
+    "response_time": 30.0,
+    "difficulty_level": 0.0,  # 0-1 scale
+    "improvement_rate": 0.0,
+    "puzzle_streak": 0,
+    "total_attempts": 0,
+    "correct_attempts": 0
+}
+DEFAULT_RECORD = RECORD.pack(*(DEFAULTS[field] for field in FIELDS))
+
+def _field(name: str) -> Dict[str, Any]:
+    return {"$ifNull": [f"${name}", DEFAULTS[name]]}
+
+class LearnerStateStore:
+    """Per-user learner state shared by every worker through MongoDB.
+
+    Each user is one fixed-size packed record (28 bytes) in an in-process
+    LRU. Updates are a single pipeline ``findOneAndUpdate`` that recomputes
+    the moving averages server-side, so concurrent workers never lose an
+    attempt; the returned document refreshes the local copy. Requests use
+    ``record_attempt_later``, which applies the same update to the local
+    record right away and runs the write in the background. Entries
+    written by other workers are picked up once ``ttl`` seconds pass.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: float = None):
+        self.max_entries = max_entries or int(os.getenv("LEARNER_STATE_CACHE_SIZE", 100000))
+        self.ttl = ttl or float(os.getenv("LEARNER_STATE_TTL", 5))
+        self._records: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._writes = set()
+        # Background writes per user; the last one to land refreshes the local record
+        self._in_flight: Dict[str, int] = {}
+
+        self.hits = 0
+        self.loads = 0
+        self.updates = 0
+        self.errors = 0
+
+    @property
+    def collection(self):
+        return db_client.get_async_collection("learner_state")
+
+    def _remember(self, user_id: str, doc: Optional[Dict[str, Any]]) -> bytes:
+        doc = doc or {}
+        record = RECORD.pack(*(doc.get(field, DEFAULTS[field]) for field in FIELDS))
+        self._records[user_id] = (time.monotonic() + self.ttl, record)
+        self._records.move_to_end(user_id)
+        while len(self._records) > self.max_entries:
+            self._records.popitem(last=False)
+        return record
+
+    async def get(self, user_id: str) -> Dict[str, Any]:
+        entry = self._records.get(user_id)
+        # While our own writes are pending the stored document may predate them; the
+        # cached record already has them applied and the last write refreshes it
+        if entry is not None and (entry[0] > time.monotonic() or self._in_flight.get(user_id)):
+            self._records.move_to_end(user_id)
+            self.hits += 1
+            return dict(zip(FIELDS, RECORD.unpack(entry[1])))
+
+        try:
+            doc = await self.collection.find_one({"user_id": user_id}, {"_id": 0})
+        except PyMongoError as e:
+            self.errors += 1
+            print(f"Learner state lookup failed for {user_id}: {e}")
+            record = entry[1] if entry else DEFAULT_RECORD
+            return dict(zip(FIELDS, RECORD.unpack(record)))
+        self.loads += 1
+        if self._in_flight.get(user_id):
+            # A write started while we waited (or the record was evicted); let it refresh the cache
+            return {field: (doc or {}).get(field, DEFAULTS[field]) for field in FIELDS}
+        return dict(zip(FIELDS, RECORD.unpack(self._remember(user_id, doc))))
+
+    def record_attempt_later(self, user_id: str, correct: bool, time_taken: float):
+        """Count an attempt locally now and persist it in the background"""
+        entry = self._records.get(user_id)
+        if entry is not None:
+            state = dict(zip(FIELDS, RECORD.unpack(entry[1])))
+            state["total_attempts"] += 1
+            state["correct_attempts"] += int(correct)
+            state["puzzle_streak"] = state["puzzle_streak"] + 1 if correct else 0
+            state["response_time"] = 0.9 * state["response_time"] + 0.1 * time_taken
+            state["accuracy"] = (0.9 * state["accuracy"]
+                                 + 0.1 * state["correct_attempts"] / state["total_attempts"])
+            # Keep the expiry so other workers' updates are still picked up on time
+            self._records[user_id] = (entry[0], RECORD.pack(*(state[field] for field in FIELDS)))
+
+        self._in_flight[user_id] = self._in_flight.get(user_id, 0) + 1
+        task = asyncio.create_task(self.record_attempt(user_id, correct, time_taken))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def close(self):
+        """Wait for background writes, e.g. on shutdown"""
+        await asyncio.gather(*self._writes, return_exceptions=True)
+
+    async def record_attempt(self, user_id: str, correct: bool, time_taken: float):
+        """Count one attempt and update the moving averages atomically in MongoDB"""
+        pipeline = [
+            {"$set": {
+                "total_attempts": {"$add": [_field("total_attempts"), 1]},
+                "correct_attempts": {"$add": [_field("correct_attempts"), int(correct)]},
+                "puzzle_streak": {"$add": [_field("puzzle_streak"), 1]} if correct else 0,
+                "response_time": {"$add": [
+                    {"$multiply": [0.9, _field("response_time")]}, 0.1 * time_taken
+                ]},
+                "difficulty_level": _field("difficulty_level"),
+                "improvement_rate": _field("improvement_rate")
+            }},
+            # Second stage sees the incremented counters
+            {"$set": {
+                "accuracy": {"$add": [
+                    {"$multiply": [0.9, _field("accuracy")]},
+                    {"$multiply": [0.1, {"$divide": ["$correct_attempts", "$total_attempts"]}]}
+                ]}
+            }}
+        ]
+        try:
+            doc = await self.collection.find_one_and_update(
+                {"user_id": user_id}, pipeline, upsert=True,
+                projection={"_id": 0}, return_document=ReturnDocument.AFTER
+            )
+        except PyMongoError as e:
+            self.errors += 1
+            print(f"Learner state update failed for {user_id}: {e}")
+            return
+        finally:
+            latest = self._release(user_id)
+        self.updates += 1
+        if latest:
+            # An earlier write's result would undo the optimistic update of a later one
+            self._remember(user_id, doc)
+
+    def _release(self, user_id: str) -> bool:
+        """Count a finished write; True if no other write for the user is pending"""
+        pending = self._in_flight.get(user_id, 0) - 1
+        if pending > 0:
+            self._in_flight[user_id] = pending
+            return False
+        self._in_flight.pop(user_id, None)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached_users": len(self._records),
+            "max_entries": self.max_entries,
+            "record_bytes": RECORD.size,
+            "hits": self.hits,
+            "loads": self.loads,
+            "updates": self.updates,
+            "pending_writes": len(self._writes),
+            "errors": self.errors
+        }
+
+learner_state = LearnerStateStore()
@@ -0,0 +1,160 @@
+import asyncio
+import os
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Set, Tuple
+
+from database.models import DifficultyLevel
+from services.executor import run_blocking
+from services.puzzle_gen import puzzle_generator
+
+BufferKey = Tuple[DifficultyLevel, int]
+
+class PuzzleBuffer:
+    """Ready-to-serve puzzles per difficulty and rating band.
+
+    Each (difficulty, band) has a ring buffer of up to ``capacity`` puzzles.
+    Taking a puzzle that leaves fewer than ``low_watermark`` schedules a
+    background refill back up to capacity, run on the blocking executor so
+    engine-generated fallbacks never hold up a request. Puzzles a user saw
+    recently are skipped (and left for other users); an empty buffer counts
+    as starvation and the caller generates synchronously.
+    """
+
+    def __init__(self, generator=None, capacity: int = None, low_watermark: int = None,
+                 band_width: int = None, producers: int = None,
+                 recent_per_user: int = None, max_users: int = None):
+        self.generator = generator or puzzle_generator
+        self.capacity = capacity or int(os.getenv("PUZZLE_BUFFER_SIZE", 32))
+        self.low_watermark = low_watermark or int(os.getenv("PUZZLE_BUFFER_LOW", 8))
+        self.band_width = band_width or int(os.getenv("PUZZLE_BUFFER_BAND", 200))
+        self.producers = producers or int(os.getenv("PUZZLE_BUFFER_PRODUCERS", 2))
+        self.recent_per_user = recent_per_user or int(os.getenv("PUZZLE_RECENT_PER_USER", 50))
+        self.max_users = max_users or int(os.getenv("PUZZLE_RECENT_USERS", 10000))
+
+        self._buffers: Dict[BufferKey, Deque[Dict[str, Any]]] = {}
+        self._recent: "OrderedDict[str, Tuple[Deque[str], Set[str]]]" = OrderedDict()
+        self._refills: Optional[asyncio.Queue] = None
+        self._scheduled: Set[BufferKey] = set()
+        self._tasks = []
+
+        self.hits = 0
+        self.starved = 0
+        self.skipped_seen = 0
+        self.refilled = 0
+        self.failed = 0
+
+    def start(self, warm_rating: int = 1200):
+        if self._tasks:
+            return
+        self._refills = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._producer()) for _ in range(self.producers)]
+        # Pre-fill the bands a new user lands in
+        for difficulty in DifficultyLevel:
+            self._schedule(self.key(difficulty, warm_rating))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def key(self, difficulty: DifficultyLevel, user_rating: int) -> BufferKey:
+        rating = self.generator.target_rating(difficulty, user_rating)
+        return (difficulty, rating // self.band_width)
+
+    def take(self, user_id: str, difficulty: DifficultyLevel, user_rating: int) -> Optional[Dict[str, Any]]:
+        """Pop a puzzle this user hasn't seen recently, or None if the band is starved"""
+        key = self.key(difficulty, user_rating)
+        buffer = self._buffers.setdefault(key, deque(maxlen=self.capacity))
+        seen = self._seen(user_id)
+
+        puzzle = None
+        for _ in range(len(buffer)):
+            candidate = buffer.popleft()
+            if candidate["puzzle_id"] in seen:
+                # Rotate it to the back for someone else
+                buffer.append(candidate)
+                self.skipped_seen += 1
+                continue
+            puzzle = candidate
+            break
+
+        if len(buffer) < self.low_watermark:
+            self._schedule(key)
+        if puzzle is None:
+            self.starved += 1
+            return None
+
+        self.hits += 1
+        self.remember(user_id, puzzle["puzzle_id"])
+        return puzzle
+
+    def _seen(self, user_id: str) -> Set[str]:
+        entry = self._recent.get(user_id)
+        return entry[1] if entry else set()
+
+    def remember(self, user_id: str, puzzle_id: str):
+        entry = self._recent.get(user_id)
+        if entry is None:
+            entry = self._recent[user_id] = (deque(), set())
+            while len(self._recent) > self.max_users:
+                self._recent.popitem(last=False)
+        self._recent.move_to_end(user_id)
+
+        order, ids = entry
+        if puzzle_id in ids:
+            return
+        order.append(puzzle_id)
+        ids.add(puzzle_id)
+        if len(order) > self.recent_per_user:
+            ids.discard(order.popleft())
+
+    def _schedule(self, key: BufferKey):
+        if self._refills is None or key in self._scheduled:
+            return
+        self._scheduled.add(key)
+        self._refills.put_nowait(key)
+
+    async def _producer(self):
+        while True:
+            key = await self._refills.get()
+            difficulty, band = key
+            buffer = self._buffers.setdefault(key, deque(maxlen=self.capacity))
+            # Generate at the band's midpoint (the band already encodes the difficulty offset)
+            rating = band * self.band_width + self.band_width // 2
+            try:
+                while len(buffer) < self.capacity:
+                    puzzle = await run_blocking(self.generator.generate_at_rating, difficulty, rating)
+                    if any(queued["puzzle_id"] == puzzle["puzzle_id"] for queued in buffer):
+                        # Small band; stop rather than fill it with repeats
+                        break
+                    buffer.append(puzzle)
+                    self.refilled += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                print(f"Puzzle buffer refill for {difficulty.value} band {band} failed: {e}")
+            finally:
+                self._scheduled.discard(key)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.starved
+        return {
+            "depth": {
+                f"{difficulty.value}:{band * self.band_width}-{(band + 1) * self.band_width - 1}": len(buffer)
+                for (difficulty, band), buffer in self._buffers.items()
+            },
+            "capacity": self.capacity,
+            "low_watermark": self.low_watermark,
+            "refills_pending": len(self._scheduled),
+            "hits": self.hits,
+            "starved": self.starved,
+            "starvation_rate": round(self.starved / lookups, 3) if lookups else 0.0,
+            "skipped_seen": self.skipped_seen,
+            "refilled": self.refilled,
+            "failed": self.failed,
+            "users_tracked": len(self._recent)
+        }
+
+puzzle_buffer = PuzzleBuffer()
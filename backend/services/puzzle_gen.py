@@ -1,8 +1,11 @@
 import chess
+import hashlib
+import os
 import random
 from typing import List, Dict, Optional
 from stockfish.engine import stockfish_engine
 from database.models import DifficultyLevel
+from database.puzzle_store import puzzle_store, build_response_tree
 
 class PuzzleGenerator:
     def __init__(self):
@@ -11,12 +14,40 @@ class PuzzleGenerator:
             "deflection", "decoy", "interference", "remove_the_defender",
             "back_rank", "smothered_mate", "arabian_mate", "h_file_attack"
         ]
+        self.store = puzzle_store
+        # Puzzles are picked within +/- this many points of the target rating
+        self.rating_band = int(os.getenv("PUZZLE_RATING_BAND", 100))
     
-    def generate_puzzle(self, difficulty: DifficultyLevel, user_rating: int = 1200) -> Dict:
-        """Generate a puzzle based on difficulty and user rating"""
-        # Simplified puzzle generation - in practice, you'd use a puzzle database
-        # This generates random tactical positions
+    def target_rating(self, difficulty: DifficultyLevel, user_rating: int) -> int:
+        rating_map = {
+            DifficultyLevel.BEGINNER: max(800, user_rating - 200),
+            DifficultyLevel.INTERMEDIATE: user_rating,
+            DifficultyLevel.ADVANCED: min(2200, user_rating + 200)
+        }
+        return rating_map[difficulty]
+    
+    def generate_puzzle(self, difficulty: DifficultyLevel, user_rating: int = 1200,
+                        theme: Optional[str] = None) -> Dict:
+        """Pick a curated puzzle near the target rating (no engine call)"""
+        return self.generate_at_rating(difficulty, self.target_rating(difficulty, user_rating), theme)
+    
+    def generate_at_rating(self, difficulty: DifficultyLevel, rating: int,
+                           theme: Optional[str] = None) -> Dict:
+        puzzle = self.store.select(rating - self.rating_band, rating + self.rating_band, theme)
+        if puzzle is None and theme:
+            puzzle = self.store.select(rating - self.rating_band, rating + self.rating_band)
+        if puzzle is None:
+            # Empty store (nothing imported yet) or no puzzle in the band
+            return self.generate_random_puzzle(difficulty, rating)
         
+        return {
+            **puzzle,
+            "difficulty": difficulty,
+            "theme": theme if theme in puzzle["themes"] else (puzzle["themes"] or [None])[0]
+        }
+    
+    def generate_random_puzzle(self, difficulty: DifficultyLevel, rating: int = 1200) -> Dict:
+        """Fallback: random-walk position solved with an engine search"""
         base_board = chess.Board()
         
         # Create a somewhat random but tactical position
@@ -36,52 +67,57 @@ class PuzzleGenerator:
         
         if not best_move or base_board.is_game_over():
             # Retry if position is terminal
-            return self.generate_puzzle(difficulty, user_rating)
+            return self.generate_random_puzzle(difficulty, rating)
         
-        # Determine puzzle rating based on difficulty
-        rating_map = {
-            DifficultyLevel.BEGINNER: max(800, user_rating - 200),
-            DifficultyLevel.INTERMEDIATE: user_rating,
-            DifficultyLevel.ADVANCED: min(2200, user_rating + 200)
-        }
-        
-        puzzle_rating = rating_map[difficulty]
-        
-        return {
+        puzzle = {
+            # Stable across workers and restarts, like mined puzzles
+            "puzzle_id": "generated_" + hashlib.sha1(base_board.epd().encode("utf-8")).hexdigest()[:12],
             "fen": fen,
             "solution": [best_move],
-            "difficulty": difficulty,
-            "theme": random.choice(self.themes),
-            "rating": puzzle_rating
+            "rating": rating
         }
+        # Kept apart from the curated puzzles, so select() never serves it
+        self.store.insert_generated({**puzzle, "tree": build_response_tree(fen, [best_move])})
+        return {**puzzle, "difficulty": difficulty, "theme": random.choice(self.themes)}
+    
+    def get_puzzle(self, puzzle_id: str) -> Optional[Dict]:
+        """A served puzzle with its response tree"""
+        return self.store.get(puzzle_id)
     
-    def validate_puzzle_solution(self, fen: str, user_moves: List[str], 
-                               solution: List[str]) -> Dict[str, bool]:
-        """Validate if user's moves match the puzzle solution"""
-        board = chess.Board(fen)
+    def validate_puzzle_solution(self, puzzle: Dict, user_moves: List[str]) -> Dict:
+        """Check the solver's moves so far against the puzzle's response tree.
+
+        ``user_moves`` holds only the solver's moves; the opponent's replies
+        come from the tree, and the next one is returned as ``reply``.
+        """
+        tree = puzzle["tree"]
+        if not user_moves:
+            return {"correct": False, "complete": False, "message": "No moves given."}
         
-        try:
-            # Check if user's first move matches solution's first move
-            user_first_move = user_moves[0] if user_moves else None
-            solution_first_move = solution[0] if solution else None
-            
-            if user_first_move != solution_first_move:
+        for step, move in enumerate(user_moves[:len(tree)]):
+            accepted = tree[step]["moves"]
+            if move not in accepted:
                 return {
                     "correct": False,
+                    "complete": False,
+                    "step": step,
                     "message": "Incorrect move. Try to find the tactical sequence!"
                 }
-            
-            # For now, we only validate the first move
-            # In a full implementation, you'd validate the entire sequence
-            return {
-                "correct": True,
-                "message": "Excellent move! That's the correct solution."
-            }
-            
-        except Exception as e:
-            return {
-                "correct": False,
-                "message": f"Error validating move: {e}"
-            }
+            reply = accepted[move]
+            if reply is None:
+                return {
+                    "correct": True,
+                    "complete": True,
+                    "step": step,
+                    "message": "Excellent move! That's the correct solution."
+                }
+        
+        return {
+            "correct": True,
+            "complete": False,
+            "step": step,
+            "reply": reply,
+            "message": "Correct! Keep going."
+        }
 
 puzzle_generator = PuzzleGenerator()
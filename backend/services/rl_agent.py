@@ -1,10 +1,14 @@
-import torch
-import torch.nn as nn
-import torch.optim as optim
+import asyncio
+import os
 import numpy as np
-from typing import Tuple, List, Dict
+from typing import Callable, Dict, List, Tuple
 from enum import Enum
 
+from services.learner_state import learner_state
+
+# torch is only imported (via services.rl_model) by the torch backend and training,
+# so workers that just serve decisions with the NumPy backend never load it
+
 class Action(Enum):
     INCREASE_DIFFICULTY = 0
     DECREASE_DIFFICULTY = 1
@@ -12,94 +16,159 @@ class Action(Enum):
     PROVIDE_HINT = 3
     NO_HINT = 4
 
-class ChessRLAgent(nn.Module):
-    def __init__(self, state_dim: int = 5, action_dim: int = 5, hidden_dim: int = 64):
-        super(ChessRLAgent, self).__init__()
-        
-        self.policy_network = nn.Sequential(
-            nn.Linear(state_dim, hidden_dim),
-            nn.ReLU(),
-            nn.Linear(hidden_dim, hidden_dim),
-            nn.ReLU(),
-            nn.Linear(hidden_dim, action_dim),
-            nn.Softmax(dim=-1)
-        )
-        
-        self.value_network = nn.Sequential(
-            nn.Linear(state_dim, hidden_dim),
-            nn.ReLU(),
-            nn.Linear(hidden_dim, hidden_dim),
-            nn.ReLU(),
-            nn.Linear(hidden_dim, 1)
-        )
-        
-        self.optimizer = optim.Adam(self.parameters(), lr=0.001)
-        self.gamma = 0.99  # Discount factor
-        
-    def forward(self, state: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
-        action_probs = self.policy_network(state)
-        state_value = self.value_network(state)
-        return action_probs, state_value
-    
-    def select_action(self, state: np.ndarray) -> Action:
-        state_tensor = torch.FloatTensor(state).unsqueeze(0)
-        action_probs, _ = self.forward(state_tensor)
-        
-        action_dist = torch.distributions.Categorical(action_probs)
-        action = action_dist.sample()
-        
-        return Action(action.item())
-    
-    def update_policy(self, rewards: List[float], states: List[np.ndarray], 
-                     actions: List[int], log_probs: List[torch.Tensor]) -> float:
-        returns = []
-        R = 0
-        
-        # Calculate discounted returns
-        for r in rewards[::-1]:
-            R = r + self.gamma * R
-            returns.insert(0, R)
-        
-        returns = torch.FloatTensor(returns)
-        returns = (returns - returns.mean()) / (returns.std() + 1e-8)
-        
-        states = torch.FloatTensor(states)
-        actions = torch.LongTensor(actions)
-        log_probs = torch.stack(log_probs)
-        
-        # Calculate advantages
-        _, state_values = self.forward(states)
-        advantages = returns - state_values.squeeze()
-        
-        # Policy loss
-        policy_loss = -(log_probs * advantages.detach()).mean()
-        
-        # Value loss
-        value_loss = advantages.pow(2).mean()
-        
-        # Total loss
-        loss = policy_loss + 0.5 * value_loss
-        
-        self.optimizer.zero_grad()
-        loss.backward()
-        self.optimizer.step()
-        
-        return loss.item()
+class NumpyPolicy:
+    """Forward pass of the policy MLP (Linear/ReLU stack, softmax output) in NumPy"""
+
+    def __init__(self, layers: List[Tuple[np.ndarray, np.ndarray]]):
+        # Stored as (in, out) so a batch is a plain matmul
+        self.layers = [(np.ascontiguousarray(weight.T, dtype=np.float32), bias.astype(np.float32))
+                       for weight, bias in layers]
+
+    @classmethod
+    def from_state_dict(cls, state_dict) -> "NumpyPolicy":
+        """Build from ``policy_network.state_dict()`` (keys like ``0.weight``, ``0.bias``)"""
+        def to_numpy(value):
+            return value.detach().cpu().numpy() if hasattr(value, "detach") else np.asarray(value)
+
+        indices = sorted({int(key.split(".")[0]) for key in state_dict if key.endswith(".weight")})
+        return cls([
+            (to_numpy(state_dict[f"{i}.weight"]), to_numpy(state_dict[f"{i}.bias"])) for i in indices
+        ])
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyPolicy":
+        data = np.load(path)
+        count = len(data.files) // 2
+        return cls([(data[f"w{i}"].T, data[f"b{i}"]) for i in range(count)])
+
+    def save(self, path: str):
+        arrays = {}
+        for i, (weight, bias) in enumerate(self.layers):
+            arrays[f"w{i}"] = weight
+            arrays[f"b{i}"] = bias
+        np.savez(path, **arrays)
+
+    def probs(self, states: np.ndarray) -> np.ndarray:
+        x = states.astype(np.float32)
+        for i, (weight, bias) in enumerate(self.layers):
+            x = x @ weight + bias
+            if i < len(self.layers) - 1:
+                np.maximum(x, 0, out=x)
+        x -= x.max(axis=1, keepdims=True)
+        np.exp(x, out=x)
+        return x / x.sum(axis=1, keepdims=True)
+
+class BatchedPolicy:
+    """Micro-batches action decisions from concurrent requests.
+
+    The first pending decision opens a window of ``max_wait`` seconds; all
+    decisions that arrive within it (up to ``max_batch``) are evaluated in
+    one forward pass and each is sampled from its own row.
+    """
+
+    def __init__(self, infer: Callable[[np.ndarray], np.ndarray],
+                 max_batch: int = None, max_wait: float = None):
+        self.infer = infer
+        self.max_batch = max_batch or int(os.getenv("RL_MAX_BATCH", 64))
+        self.max_wait = max_wait or float(os.getenv("RL_BATCH_WAIT_MS", 2)) / 1000
+        self._pending: List[Tuple[np.ndarray, asyncio.Future]] = []
+        self._timer = None
+        self._rng = np.random.default_rng()
+
+        self.decisions = 0
+        self.batches = 0
+
+    async def select_action(self, state: np.ndarray) -> Action:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((state, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        try:
+            probs = self.infer(np.stack([state for state, _ in pending]))
+            # Sample one action per row: first index whose cumulative probability exceeds a uniform draw
+            draws = self._rng.random((len(pending), 1))
+            actions = (probs.cumsum(axis=1) < draws).sum(axis=1).clip(max=probs.shape[1] - 1)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), action in zip(pending, actions):
+            if not future.done():
+                future.set_result(Action(int(action)))
+        self.decisions += len(pending)
+        self.batches += 1
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "decisions": self.decisions,
+            "batches": self.batches,
+            "mean_batch_size": round(self.decisions / self.batches, 2) if self.batches else 0.0
+        }
 
 class AdaptiveTutor:
     def __init__(self):
-        self.agent = ChessRLAgent()
-        self.user_history = {}
+        # Shared across workers and restarts; see services/learner_state.py
+        self.learner_state = learner_state
+        # "torch" runs the model's policy head; "numpy" needs torch only if RL_POLICY_WEIGHTS is unset
+        self.backend = os.getenv("RL_INFERENCE_BACKEND", "torch").lower()
+        self.weights_path = os.getenv("RL_POLICY_WEIGHTS")
+        self._agent = None
+        self._numpy_policy = None
+        self.policy = BatchedPolicy(self._infer)
+    
+    @property
+    def agent(self):
+        if self._agent is None:
+            from services.rl_model import ChessRLAgent
+            self._agent = ChessRLAgent()
+        return self._agent
     
-    def get_state(self, user_id: str) -> np.ndarray:
+    def load_policy(self):
+        """Load the inference backend (torch model or NumPy weights); blocking, run it on the executor
+
+        Called at startup so the first batched decision doesn't import torch
+        or read weights on the event loop.
+        """
+        if self.backend == "numpy":
+            if self._numpy_policy is None:
+                self._numpy_policy = (NumpyPolicy.load(self.weights_path) if self.weights_path
+                                      else NumpyPolicy.from_state_dict(self.agent.policy_network.state_dict()))
+        else:
+            # Imports torch and builds the model on first access
+            self.agent
+    
+    def _infer(self, states: np.ndarray) -> np.ndarray:
+        # A no-op once load_policy has run
+        self.load_policy()
+        if self.backend == "numpy":
+            return self._numpy_policy.probs(states)
+        
+        from services.rl_model import policy_probs
+        return policy_probs(self.agent, states)
+    
+    def refresh_policy(self):
+        """Rebuild the NumPy snapshot after the torch model was trained"""
+        if self.backend == "numpy" and not self.weights_path:
+            # Swapped in whole so concurrent decisions keep using the old snapshot meanwhile
+            self._numpy_policy = NumpyPolicy.from_state_dict(self.agent.policy_network.state_dict())
+    
+    async def get_state(self, user_id: str) -> np.ndarray:
         """Get current state representation for RL agent"""
-        history = self.user_history.get(user_id, {
-            'accuracy': 0.5,
-            'response_time': 30.0,
-            'puzzle_streak': 0,
-            'difficulty_level': 0.0,  # 0-1 scale
-            'improvement_rate': 0.0
-        })
+        history = await self.learner_state.get(user_id)
         
         return np.array([
             history['accuracy'],
@@ -130,10 +199,10 @@ class AdaptiveTutor:
         
         return reward
     
-    def decide_action(self, user_id: str, correct: bool, time_taken: float) -> Action:
+    async def decide_action(self, user_id: str, correct: bool, time_taken: float) -> Action:
         """Decide tutor action based on current state"""
-        state = self.get_state(user_id)
-        action = self.agent.select_action(state)
+        state = await self.get_state(user_id)
+        action = await self.policy.select_action(state)
         
         # Update user history
         self.update_user_history(user_id, correct, time_taken)
@@ -141,33 +210,8 @@ class AdaptiveTutor:
         return action
     
     def update_user_history(self, user_id: str, correct: bool, time_taken: float):
-        """Update user performance history"""
-        if user_id not in self.user_history:
-            self.user_history[user_id] = {
-                'accuracy': 0.5,
-                'response_time': 30.0,
-                'puzzle_streak': 0,
-                'difficulty_level': 0.0,
-                'improvement_rate': 0.0,
-                'total_attempts': 0,
-                'correct_attempts': 0
-            }
-        
-        history = self.user_history[user_id]
-        history['total_attempts'] += 1
-        
-        if correct:
-            history['correct_attempts'] += 1
-            history['puzzle_streak'] += 1
-        else:
-            history['puzzle_streak'] = 0
-        
-        # Update accuracy (moving average)
-        new_accuracy = history['correct_attempts'] / history['total_attempts']
-        history['accuracy'] = 0.9 * history['accuracy'] + 0.1 * new_accuracy
-        
-        # Update response time (moving average)
-        history['response_time'] = 0.9 * history['response_time'] + 0.1 * time_taken
+        """Update user performance history (persisted in the background)"""
+        self.learner_state.record_attempt_later(user_id, correct, time_taken)
 
 # Global adaptive tutor
 adaptive_tutor = AdaptiveTutor()
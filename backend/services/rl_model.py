@@ -0,0 +1,90 @@
+import torch
+import torch.nn as nn
+import torch.optim as optim
+import numpy as np
+from typing import Tuple, List
+
+from services.rl_agent import Action, NumpyPolicy
+
+class ChessRLAgent(nn.Module):
+    def __init__(self, state_dim: int = 5, action_dim: int = 5, hidden_dim: int = 64):
+        super(ChessRLAgent, self).__init__()
+        
+        self.policy_network = nn.Sequential(
+            nn.Linear(state_dim, hidden_dim),
+            nn.ReLU(),
+            nn.Linear(hidden_dim, hidden_dim),
+            nn.ReLU(),
+            nn.Linear(hidden_dim, action_dim),
+            nn.Softmax(dim=-1)
+        )
+        
+        self.value_network = nn.Sequential(
+            nn.Linear(state_dim, hidden_dim),
+            nn.ReLU(),
+            nn.Linear(hidden_dim, hidden_dim),
+            nn.ReLU(),
+            nn.Linear(hidden_dim, 1)
+        )
+        
+        self.optimizer = optim.Adam(self.parameters(), lr=0.001)
+        self.gamma = 0.99  # Discount factor
+        
+    def forward(self, state: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        action_probs = self.policy_network(state)
+        state_value = self.value_network(state)
+        return action_probs, state_value
+    
+    def select_action(self, state: np.ndarray) -> Action:
+        state_tensor = torch.FloatTensor(state).unsqueeze(0)
+        action_probs, _ = self.forward(state_tensor)
+        
+        action_dist = torch.distributions.Categorical(action_probs)
+        action = action_dist.sample()
+        
+        return Action(action.item())
+    
+    def update_policy(self, rewards: List[float], states: List[np.ndarray], 
+                     actions: List[int], log_probs: List[torch.Tensor]) -> float:
+        returns = []
+        R = 0
+        
+        # Calculate discounted returns
+        for r in rewards[::-1]:
+            R = r + self.gamma * R
+            returns.insert(0, R)
+        
+        returns = torch.FloatTensor(returns)
+        returns = (returns - returns.mean()) / (returns.std() + 1e-8)
+        
+        states = torch.FloatTensor(states)
+        actions = torch.LongTensor(actions)
+        log_probs = torch.stack(log_probs)
+        
+        # Calculate advantages
+        _, state_values = self.forward(states)
+        advantages = returns - state_values.squeeze()
+        
+        # Policy loss
+        policy_loss = -(log_probs * advantages.detach()).mean()
+        
+        # Value loss
+        value_loss = advantages.pow(2).mean()
+        
+        # Total loss
+        loss = policy_loss + 0.5 * value_loss
+        
+        self.optimizer.zero_grad()
+        loss.backward()
+        self.optimizer.step()
+        
+        return loss.item()
+
+def policy_probs(agent: ChessRLAgent, states: np.ndarray) -> np.ndarray:
+    """Action probabilities for a batch of states; policy head only, no autograd"""
+    with torch.inference_mode():
+        return agent.policy_network(torch.from_numpy(states.astype(np.float32))).numpy()
+
+def export_policy(agent: ChessRLAgent, path: str):
+    """Write the policy weights for torch-free workers (RL_POLICY_WEIGHTS)"""
+    NumpyPolicy.from_state_dict(agent.policy_network.state_dict()).save(path)
@@ -0,0 +1,30 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Any
+
+class StartupReport:
+    """Wall-clock time spent bringing up each subsystem, in milliseconds"""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float):
+        self.phases[name] = round(seconds * 1000, 1)
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def summary(self) -> Dict[str, Any]:
+        return {"phases_ms": dict(self.phases), "total_ms": round(sum(self.phases.values()), 1)}
+
+    def print(self):
+        for name, ms in self.phases.items():
+            print(f"  {name:<20} {ms:>8.1f} ms")
+        print(f"  {'total':<20} {sum(self.phases.values()):>8.1f} ms")
+
+startup_report = StartupReport()
@@ -2,10 +2,12 @@ import chess
 import chess.engine
 import random
 from typing import Dict, List
+from stockfish.engine import stockfish_engine
 
 class MultiLevelStockfish:
-    def __init__(self, stockfish_path: str = "stockfish"):
-        self.engine = chess.engine.SimpleEngine.popen_uci(stockfish_path)
+    def __init__(self, pool=None):
+        # Share the analysis engine pool instead of spawning a private process
+        self._pool = pool
         self.levels = {
             1: {"depth": 1, "skill": 0, "time": 0.1},   # 800 ELO
             5: {"depth": 5, "skill": 10, "time": 0.5},  # 1200 ELO
@@ -14,23 +16,49 @@ class MultiLevelStockfish:
             20: {"depth": 20, "skill": 20, "time": 3.0}  # 2800 ELO
         }
     
+    @property
+    def pool(self):
+        return self._pool or stockfish_engine.pool
+    
     def get_move(self, fen: str, level: int) -> str:
+        return self.play(fen, level)["move"]
+    
+    def play(self, fen: str, level: int) -> Dict:
+        """Choose a move and apply it, keeping the evaluation from the search that chose it"""
         board = chess.Board(fen)
         level_config = self.levels.get(level, self.levels[10])
         
         # Add some randomness for lower levels to simulate human mistakes
         if level <= 5 and random.random() < 0.3:
             legal_moves = list(board.legal_moves)
-            return random.choice(legal_moves).uci()
+            move = random.choice(legal_moves)
+            board.push(move)
+            return {"move": move.uci(), "new_fen": board.fen(), "evaluation": {}}
         
-        result = self.engine.play(
-            board,
-            chess.engine.Limit(
-                depth=level_config["depth"],
-                time=level_config["time"]
+        with self.pool.engine() as engine:
+            result = engine.play(
+                board,
+                chess.engine.Limit(
+                    depth=level_config["depth"],
+                    time=level_config["time"]
+                ),
+                info=chess.engine.INFO_SCORE | chess.engine.INFO_PV
             )
-        )
-        return result.move.uci()
+        
+        evaluation = {}
+        if "score" in result.info:
+            # The score of the chosen line is the evaluation after the move
+            score = result.info["score"].white()
+            pv = result.info.get("pv", [])
+            evaluation = {
+                "score_cp": score.score(mate_score=10000),
+                "score_mate": score.mate(),
+                "best_move": pv[1].uci() if len(pv) > 1 else None,
+                "depth": result.info.get("depth", level_config["depth"])
+            }
+        
+        board.push(result.move)
+        return {"move": result.move.uci(), "new_fen": board.fen(), "evaluation": evaluation}
     
     def get_level_description(self, level: int) -> Dict:
         descriptions = {
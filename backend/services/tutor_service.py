@@ -1,10 +1,13 @@
-from typing import Dict, Any, Optional,List
+from typing import Dict, Any, Optional,List, AsyncIterator
+import asyncio
 import chess
 from stockfish.engine import stockfish_engine
 from reasoning.ollama_client import ollama_client
 from services.rl_agent import adaptive_tutor, Action
 from services.puzzle_gen import puzzle_generator
+from services.puzzle_buffer import puzzle_buffer
 from database.models import DifficultyLevel
+from services.executor import run_blocking
 
 class TutorService:
     def __init__(self):
@@ -12,33 +15,87 @@ class TutorService:
         self.ollama = ollama_client
         self.tutor = adaptive_tutor
         self.puzzle_gen = puzzle_generator
+        self.puzzle_buffer = puzzle_buffer
     
-    def analyze_move(self, fen: str, move: str, user_id: str) -> Dict[str, Any]:
-        """Comprehensive move analysis with AI tutoring"""
-        # Validate the move
-        validation_result = self.stockfish.validate_move(fen, move)
-        
-        if not validation_result["valid"]:
+    async def analyze_move(self, fen: str, move: str, user_id: str,
+                           explain: bool = True) -> Dict[str, Any]:
+        """Comprehensive move analysis with AI tutoring
+
+        With ``explain=False`` only the engine analysis is run and the result is
+        marked ``explanation_status: "pending"`` for a later explanation job.
+        """
+        # Cheap local legality check so no LLM call is spent on an illegal move
+        legality_error = self._check_legality(fen, move)
+        if legality_error:
             return {
                 "valid": False,
-                "error": validation_result["error"],
+                "error": legality_error,
                 "explanation": "This move is not legal. Please try a different move."
             }
-        
-        # Get best move for comparison
-        best_move = self.stockfish.get_best_move(fen)
+
+        if not explain:
+            validation_result = await run_blocking(self.stockfish.analyze_move, fen, move)
+            result = await self._build_result(validation_result, move, user_id, "", "")
+            result["explanation_status"] = "pending"
+            return result
+
+        # The explanation only needs the position, so it runs alongside the engine search
+        explanation_task = asyncio.create_task(self.ollama.explain_move(fen, move))
+        try:
+            validation_result = await run_blocking(self.stockfish.analyze_move, fen, move)
+        except BaseException:
+            explanation_task.cancel()
+            raise
+
+        best_move = validation_result["best_move"]
         user_move_correct = (move == best_move)
         
-        # Generate explanation
-        explanation = self.ollama.explain_move(fen, move)
-        
-        # If move is suboptimal, provide improvement suggestion
+        # If move is suboptimal, the improvement suggestion overlaps the explanation
         improvement = ""
-        if not user_move_correct:
-            improvement = self.ollama.suggest_improvement(fen, move, best_move)
+        if user_move_correct:
+            explanation = await explanation_task
+        else:
+            explanation, improvement = await asyncio.gather(
+                explanation_task,
+                self.ollama.suggest_improvement(fen, move, best_move)
+            )
+        
+        return await self._build_result(validation_result, move, user_id, explanation, improvement)
+    
+    async def explain(self, fen: str, move: str, best_move: str) -> Dict[str, str]:
+        """LLM explanation and, for suboptimal moves, an improvement suggestion"""
+        if move == best_move:
+            return {"explanation": await self.ollama.explain_move(fen, move), "improvement_suggestion": ""}
+        explanation, improvement = await asyncio.gather(
+            self.ollama.explain_move(fen, move),
+            self.ollama.suggest_improvement(fen, move, best_move)
+        )
+        return {"explanation": explanation, "improvement_suggestion": improvement}
+    
+    async def tutor_move(self, fen: str, move: str) -> Dict[str, Any]:
+        """Full engine analysis plus explanation, without an adaptive-tutor decision"""
+        validation_result = await run_blocking(self.stockfish.analyze_move, fen, move)
+        if not validation_result["valid"]:
+            return validation_result
+        texts = await self.explain(fen, move, validation_result["best_move"])
+        return {
+            "valid": True,
+            "correct": move == validation_result["best_move"],
+            "new_fen": validation_result["new_fen"],
+            "best_move": validation_result["best_move"],
+            "centipawn_loss": validation_result["centipawn_loss"],
+            "evaluation": validation_result["evaluation"],
+            "explanation_status": "ready",
+            **texts
+        }
+    
+    async def _build_result(self, validation_result: Dict[str, Any], move: str, user_id: str,
+                      explanation: str, improvement: str) -> Dict[str, Any]:
+        best_move = validation_result["best_move"]
+        user_move_correct = (move == best_move)
         
         # Get adaptive tutoring decision
-        action = self.tutor.decide_action(user_id, user_move_correct, 30.0)  # Default time
+        action = await self.tutor.decide_action(user_id, user_move_correct, 30.0)  # Default time
         
         return {
             "valid": True,
@@ -47,14 +104,112 @@ class TutorService:
             "explanation": explanation,
             "improvement_suggestion": improvement,
             "best_move": best_move,
+            "centipawn_loss": validation_result["centipawn_loss"],
             "tutor_action": action.value,
             "evaluation": validation_result.get("evaluation", {})
         }
     
-    def generate_adaptive_puzzle(self, user_id: str, user_rating: int) -> Dict[str, Any]:
+    def _check_legality(self, fen: str, move: str) -> Optional[str]:
+        try:
+            chess_move = chess.Move.from_uci(move)
+        except ValueError:
+            return "Invalid move notation"
+        if chess_move not in chess.Board(fen).legal_moves:
+            return "Illegal move"
+        return None
+    
+    async def stream_analysis(self, fen: str, move: str, user_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Staged variant of analyze_move yielding frames as results become available
+
+        Frames, in order of arrival: ``legality`` (with the new FEN),
+        ``evaluation`` per completed search depth, ``analysis`` once the search
+        finishes, ``explanation``/``improvement`` tokens as the LLM produces
+        them, and finally ``complete`` carrying the same payload as analyze_move.
+        """
+        legality_error = self._check_legality(fen, move)
+        if legality_error:
+            yield {
+                "type": "complete",
+                "valid": False,
+                "error": legality_error,
+                "explanation": "This move is not legal. Please try a different move."
+            }
+            return
+        
+        board = chess.Board(fen)
+        board.push_uci(move)
+        yield {"type": "legality", "valid": True, "new_fen": board.fen()}
+        
+        loop = asyncio.get_running_loop()
+        frames: asyncio.Queue = asyncio.Queue()
+        
+        def on_update(evaluation: Dict[str, Any]):
+            # Called from the engine thread
+            loop.call_soon_threadsafe(frames.put_nowait, {"type": "evaluation", **evaluation})
+        
+        async def relay(tokens: AsyncIterator[str], frame_type: str) -> str:
+            parts = []
+            async for token in tokens:
+                parts.append(token)
+                await frames.put({"type": frame_type, "token": token})
+            return "".join(parts).strip()
+        
+        async def search_then_improve():
+            result = await run_blocking(self.stockfish.analyze_move, fen, move, on_update=on_update)
+            correct = (move == result["best_move"])
+            await frames.put({
+                "type": "analysis",
+                "correct": correct,
+                "best_move": result["best_move"],
+                "centipawn_loss": result["centipawn_loss"],
+                "evaluation": result["evaluation"]
+            })
+            improvement = ""
+            if not correct:
+                improvement = await relay(
+                    self.ollama.stream_suggest_improvement(fen, move, result["best_move"]),
+                    "improvement"
+                )
+            return result, improvement
+        
+        search_task = asyncio.create_task(search_then_improve())
+        explanation_task = asyncio.create_task(
+            relay(self.ollama.stream_explain_move(fen, move), "explanation")
+        )
+        tasks = {search_task, explanation_task}
+        
+        try:
+            while True:
+                running = {task for task in tasks if not task.done()}
+                if not running and frames.empty():
+                    break
+                getter = asyncio.ensure_future(frames.get())
+                done, _ = await asyncio.wait({getter, *running}, return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    yield getter.result()
+                    continue
+                getter.cancel()
+                if search_task.done() and search_task.exception():
+                    raise search_task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        validation_result, improvement = search_task.result()
+        explanation = explanation_task.result() or "Unable to generate explanation at this time."
+        if validation_result["best_move"] != move and not improvement:
+            improvement = "Good effort! Consider analyzing this position further."
+        
+        yield {
+            "type": "complete",
+            **await self._build_result(validation_result, move, user_id, explanation, improvement)
+        }
+    
+    async def generate_adaptive_puzzle(self, user_id: str, user_rating: int,
+                                       theme: Optional[str] = None) -> Dict[str, Any]:
         """Generate a puzzle adapted to user's skill level"""
         # Get current difficulty based on user performance
-        state = self.tutor.get_state(user_id)
+        state = await self.tutor.get_state(user_id)
         accuracy = state[0]
         
         # Determine difficulty based on accuracy
@@ -65,12 +220,12 @@ class TutorService:
         else:
             difficulty = DifficultyLevel.ADVANCED
         
-        puzzle = self.puzzle_gen.generate_puzzle(difficulty, user_rating)
-        
-        return {
-            "puzzle_id": f"puzzle_{hash(puzzle['fen'])}",  # Simple ID generation
-            **puzzle
-        }
+        # Themed requests are rare enough to go straight to the store
+        puzzle = None if theme else self.puzzle_buffer.take(user_id, difficulty, user_rating)
+        if puzzle is None:
+            puzzle = await run_blocking(self.puzzle_gen.generate_puzzle, difficulty, user_rating, theme)
+            self.puzzle_buffer.remember(user_id, puzzle["puzzle_id"])
+        return puzzle
     
     def provide_hint(self, fen: str, puzzle_solution: List[str], 
                     hint_level: int = 1) -> Dict[str, Any]:
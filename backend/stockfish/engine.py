@@ -2,12 +2,28 @@ import chess
 import chess.engine
 import os
 import shutil
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, List
+from stockfish.engine_pool import EnginePool
+from cache.eval_cache import eval_cache
 
 class StockfishEngine:
     def __init__(self, stockfish_path: str = None):
-        self.stockfish_path = stockfish_path or self._find_stockfish()
-        self.engine = None
+        # Binary lookup and pool are deferred so importing this module stays cheap
+        self._stockfish_path = stockfish_path
+        self._pool: Optional[EnginePool] = None
+        self.cache = eval_cache
+    
+    @property
+    def stockfish_path(self) -> str:
+        if self._stockfish_path is None:
+            self._stockfish_path = self._find_stockfish()
+        return self._stockfish_path
+    
+    @property
+    def pool(self) -> EnginePool:
+        if self._pool is None:
+            self._pool = EnginePool(self.stockfish_path)
+        return self._pool
     
     def _find_stockfish(self) -> str:
         # 1) Explicit env var
@@ -40,68 +56,145 @@ class StockfishEngine:
 
         raise Exception("Stockfish not found. Please install Stockfish or set STOCKFISH_PATH.")
     
-    def start_engine(self):
-        if not self.engine:
-            self.engine = chess.engine.SimpleEngine.popen_uci(self.stockfish_path)
+    @property
+    def running(self) -> bool:
+        return self._pool is not None and self._pool.running
+    
+    def start_engine(self, warm: int = None):
+        # STOCKFISH_WARM=0 leaves every engine process to be spawned on first use
+        self.pool.start(warm=warm if warm is not None else int(os.getenv("STOCKFISH_WARM", 1)))
     
     def stop_engine(self):
-        if self.engine:
-            self.engine.quit()
-            self.engine = None
+        self.pool.stop()
     
     def evaluate_position(self, fen: str, depth: int = 15) -> Dict[str, Any]:
         """Evaluate a chess position and return analysis"""
-        self.start_engine()
+        cached = self.cache.get(fen, depth)
+        if cached:
+            # Entries written by analyze_move also carry its searched lines
+            return {key: value for key, value in cached.items() if key not in ("multipv", "lines")}
+
         board = chess.Board(fen)
         
         try:
-            info = self.engine.analyse(board, chess.engine.Limit(depth=depth))
-            score = info["score"]
-            
-            return {
-                "score_cp": score.white().score(mate_score=10000),
-                "score_mate": score.white().mate(),
-                "best_move": str(info.get("pv", [])[0]) if info.get("pv") else None,
-                "depth": depth
-            }
+            with self.pool.engine() as engine:
+                info = engine.analyse(board, chess.engine.Limit(depth=depth))
+            result = self._format_evaluation(info, depth)
+            self.cache.set(fen, depth, result)
+            return result
         except Exception as e:
             print(f"Error evaluating position: {e}")
             return {"error": str(e)}
     
-    def validate_move(self, fen: str, move: str) -> Dict[str, Any]:
-        """Validate if a move is legal and sound"""
+    def _format_evaluation(self, info: Dict[str, Any], depth: int) -> Dict[str, Any]:
+        score = info["score"]
+        return {
+            "score_cp": score.white().score(mate_score=10000),
+            "score_mate": score.white().mate(),
+            "best_move": str(info.get("pv", [])[0]) if info.get("pv") else None,
+            "depth": depth
+        }
+    
+    def _analyse_with_updates(self, engine, board: chess.Board, limit: chess.engine.Limit,
+                              multipv: int, on_update: Callable) -> List[Dict[str, Any]]:
+        """Run a MultiPV search, reporting each completed depth of the main line"""
+        last_depth = 0
+        with engine.analysis(board, limit, multipv=multipv) as analysis:
+            for info in analysis:
+                info_depth = info.get("depth", 0)
+                if (info.get("multipv", 1) == 1 and info_depth > last_depth
+                        and "score" in info and info.get("pv")):
+                    last_depth = info_depth
+                    on_update(self._format_evaluation(info, info_depth))
+            return analysis.multipv
+
+    @staticmethod
+    def _line(info: Dict[str, Any], turn: chess.Color) -> Dict[str, Any]:
+        """Serializable summary of one searched line, as kept in the evaluation cache"""
+        pv = info.get("pv", [])
+        white_score = info["score"].white()
+        return {
+            "move": pv[0].uci(),
+            "score": info["score"].pov(turn).score(mate_score=10000),
+            "score_cp": white_score.score(mate_score=10000),
+            "score_mate": white_score.mate(),
+            "reply": pv[1].uci() if len(pv) > 1 else None
+        }
+
+    @staticmethod
+    def _line_evaluation(line: Dict[str, Any], depth: int) -> Dict[str, Any]:
+        return {
+            "score_cp": line["score_cp"],
+            "score_mate": line["score_mate"],
+            "best_move": line["move"],
+            "depth": depth
+        }
+
+    def analyze_move(self, fen: str, move: str, depth: int = 15,
+                     multipv: int = None, on_update: Callable = None) -> Dict[str, Any]:
+        """Validate and score a move with a single MultiPV search of the pre-move position
+
+        The searched lines are cached per position, so a position seen
+        before (e.g. an opening) is scored without an engine call.
+        ``on_update`` is called with the evaluation of the principal line each
+        time the search completes a deeper iteration.
+        """
         board = chess.Board(fen)
-        
+
         try:
             chess_move = chess.Move.from_uci(move)
-            if chess_move not in board.legal_moves:
-                return {
-                    "valid": False,
-                    "error": "Illegal move"
-                }
-            
-            # Make the move and evaluate
-            board.push(chess_move)
-            evaluation = self.evaluate_position(board.fen())
-            
-            return {
-                "valid": True,
-                "new_fen": board.fen(),
-                "evaluation": evaluation
-            }
         except ValueError:
-            return {
-                "valid": False,
-                "error": "Invalid move notation"
+            return {"valid": False, "error": "Invalid move notation"}
+        if chess_move not in board.legal_moves:
+            return {"valid": False, "error": "Illegal move"}
+
+        multipv = multipv or int(os.getenv("STOCKFISH_ANALYSIS_MULTIPV", 3))
+        limit = chess.engine.Limit(depth=depth)
+
+        cached = self.cache.get(fen, depth)
+        lines = cached.get("lines") if cached and cached.get("multipv", 0) >= multipv else None
+        user_line = next((line for line in lines if line["move"] == move), None) if lines else None
+        if user_line is not None and on_update is not None:
+            on_update(self._line_evaluation(lines[0], depth))
+
+        if user_line is None:
+            with self.pool.engine() as engine:
+                if not lines:
+                    if on_update is None:
+                        infos = engine.analyse(board, limit, multipv=multipv)
+                    else:
+                        infos = self._analyse_with_updates(engine, board, limit, multipv, on_update)
+                    lines = [self._line(info, board.turn) for info in infos if info.get("pv")]
+                    user_line = next((line for line in lines if line["move"] == move), None)
+
+                if user_line is None:
+                    # User move fell outside the PV set - score it on its own
+                    info = engine.analyse(board, limit, root_moves=[chess_move])
+                    user_line = self._line(info, board.turn)
+                    # Kept after the MultiPV lines so the next request for this move is a hit too
+                    lines = lines + [user_line]
+
+            self.cache.set(fen, depth, {
+                **self._line_evaluation(lines[0], depth), "multipv": multipv, "lines": lines
+            })
+
+        best_line = lines[0]
+        # Scores from the mover's point of view, so the loss is never negative
+        centipawn_loss = max(0, best_line["score"] - user_line["score"])
+
+        board.push(chess_move)
+        return {
+            "valid": True,
+            "new_fen": board.fen(),
+            "best_move": best_line["move"],
+            "centipawn_loss": centipawn_loss,
+            "evaluation": {
+                "score_cp": user_line["score_cp"],
+                "score_mate": user_line["score_mate"],
+                "best_move": user_line["reply"],
+                "depth": depth
             }
-    
-    def get_best_move(self, fen: str, depth: int = 15) -> str:
-        """Get the best move for a position"""
-        self.start_engine()
-        board = chess.Board(fen)
-        
-        result = self.engine.play(board, chess.engine.Limit(depth=depth))
-        return result.move.uci()
+        }
 
 # Global engine instance
 stockfish_engine = StockfishEngine()
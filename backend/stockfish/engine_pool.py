@@ -0,0 +1,205 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List
+
+import chess.engine
+
+
+class EnginePool:
+    """Pool of Stockfish UCI processes shared by every engine consumer.
+
+    Engines are spawned lazily up to ``size`` and handed out one caller at a
+    time. An engine that dies mid-search is discarded and replaced on return,
+    so a crashed process never poisons the pool.
+    """
+
+    def __init__(self, stockfish_path: str, size: int = None,
+                 hash_mb: int = None, threads: int = None,
+                 checkout_timeout: float = None, health_interval: float = None):
+        self.stockfish_path = stockfish_path
+        self.size = size or int(os.getenv("STOCKFISH_POOL_SIZE") or 0) or os.cpu_count() or 1
+        self.hash_mb = hash_mb or int(os.getenv("STOCKFISH_HASH_MB", 64))
+        self.threads = threads or int(os.getenv("STOCKFISH_THREADS", 1))
+        self.checkout_timeout = checkout_timeout or float(os.getenv("STOCKFISH_CHECKOUT_TIMEOUT", 60))
+        self.health_interval = (
+            health_interval if health_interval is not None
+            else float(os.getenv("STOCKFISH_HEALTH_INTERVAL", 30))
+        )
+
+        self._idle: "queue.LifoQueue[chess.engine.SimpleEngine]" = queue.LifoQueue()
+        self._engines: List[chess.engine.SimpleEngine] = []
+        self._lock = threading.Lock()
+        self._spawning = 0
+        self._running = False
+        self._monitor: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self.restarts = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self, warm: int = 1):
+        """Mark the pool live and pre-spawn ``warm`` engines"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._stop_event.clear()
+
+        for _ in range(min(warm, self.size)):
+            engine = self._spawn()
+            if engine:
+                self._idle.put(engine)
+
+        if self.health_interval > 0 and not self._monitor:
+            self._monitor = threading.Thread(target=self._monitor_loop, daemon=True)
+            self._monitor.start()
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+            engines, self._engines = self._engines, []
+        self._stop_event.set()
+        self._monitor = None
+
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        for engine in engines:
+            self._quit(engine)
+
+    def _spawn(self) -> Optional[chess.engine.SimpleEngine]:
+        # Reserve a slot under the lock, but start the process outside it so a
+        # slow spawn doesn't hold up other spawns, discards or stop()
+        with self._lock:
+            if len(self._engines) + self._spawning >= self.size:
+                return None
+            self._spawning += 1
+
+        engine = None
+        try:
+            engine = chess.engine.SimpleEngine.popen_uci(self.stockfish_path)
+            engine.configure({"Hash": self.hash_mb, "Threads": self.threads})
+        except Exception:
+            if engine is not None:
+                self._quit(engine)
+            with self._lock:
+                self._spawning -= 1
+            raise
+
+        with self._lock:
+            self._spawning -= 1
+            running = self._running
+            if running:
+                self._engines.append(engine)
+        if not running:
+            # The pool was stopped while this engine was starting
+            self._quit(engine)
+            return None
+        return engine
+
+    def _discard(self, engine: chess.engine.SimpleEngine):
+        with self._lock:
+            if engine in self._engines:
+                self._engines.remove(engine)
+        self._quit(engine)
+
+    def _quit(self, engine: chess.engine.SimpleEngine):
+        try:
+            engine.quit()
+        except Exception:
+            try:
+                engine.close()
+            except Exception:
+                pass
+
+    def _replace(self, engine: chess.engine.SimpleEngine):
+        """Throw away a broken engine and put a fresh one in its slot"""
+        self._discard(engine)
+        self.restarts += 1
+        print("Stockfish engine crashed, restarting it")
+        if self._running:
+            try:
+                fresh = self._spawn()
+                if fresh:
+                    self._idle.put(fresh)
+            except Exception as e:
+                print(f"Failed to restart Stockfish engine: {e}")
+
+    def _acquire(self, timeout: float = None) -> chess.engine.SimpleEngine:
+        if not self._running:
+            self.start(warm=0)
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        engine = self._spawn()
+        if engine:
+            return engine
+
+        try:
+            return self._idle.get(timeout=timeout or self.checkout_timeout)
+        except queue.Empty:
+            raise TimeoutError("Timed out waiting for a free Stockfish engine")
+
+    def _release(self, engine: chess.engine.SimpleEngine, broken: bool = False):
+        if broken:
+            self._replace(engine)
+        elif self._running and engine in self._engines:
+            self._idle.put(engine)
+        else:
+            self._quit(engine)
+
+    @contextmanager
+    def engine(self, timeout: float = None):
+        """Check out an engine for the duration of a ``with`` block"""
+        engine = self._acquire(timeout)
+        broken = False
+        try:
+            yield engine
+        except (chess.engine.EngineTerminatedError, chess.engine.EngineError):
+            broken = True
+            raise
+        finally:
+            self._release(engine, broken)
+
+    def health_check(self) -> Dict[str, Any]:
+        """Ping idle engines and restart any that stopped responding"""
+        idle = []
+        while True:
+            try:
+                idle.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+        healthy = 0
+        for engine in idle:
+            try:
+                engine.ping()
+                healthy += 1
+                self._idle.put(engine)
+            except Exception:
+                self._replace(engine)
+
+        return self.stats(healthy_idle=healthy)
+
+    def _monitor_loop(self):
+        while not self._stop_event.wait(self.health_interval):
+            if not self._running:
+                break
+            self.health_check()
+
+    def stats(self, **extra) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "spawned": len(self._engines),
+            "idle": self._idle.qsize(),
+            "restarts": self.restarts,
+            "hash_mb": self.hash_mb,
+            "threads": self.threads,
+            **extra
+        }
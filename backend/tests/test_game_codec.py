@@ -0,0 +1,79 @@
+import chess
+
+from database import game_codec
+from database.game_codec import (
+    build_ply_update, decode_game, encode_game, position_at, replay_positions, CHECKPOINT_INTERVAL
+)
+from database.models import Game, GameType
+
+def play(plies: int) -> Game:
+    """A game of ``plies`` legal moves, always taking the first legal move"""
+    board = chess.Board()
+    game = Game(game_id="g1", user_id="u1", game_type=GameType.PRACTICE,
+                white_player="user", black_player="stockfish", positions=[board.fen()])
+    for _ in range(plies):
+        move = next(iter(board.legal_moves))
+        board.push(move)
+        game.moves.append(move.uci())
+        game.positions.append(board.fen())
+        game.analysis.append({"move": move.uci(), "new_fen": board.fen(), "evaluation": {}})
+    return game
+
+def test_round_trip():
+    game = play(2 * CHECKPOINT_INTERVAL + 5)
+    doc = encode_game(game)
+
+    assert "positions" not in doc
+    assert all("new_fen" not in entry for entry in doc["analysis"])
+    assert doc["checkpoint_interval"] == CHECKPOINT_INTERVAL
+    assert doc["checkpoints"] == [game.positions[CHECKPOINT_INTERVAL], game.positions[2 * CHECKPOINT_INTERVAL]]
+
+    decoded = decode_game(doc)
+    assert decoded.positions == game.positions
+    assert decoded.analysis == game.analysis
+    assert decoded.moves == game.moves
+
+def test_position_at_every_ply():
+    game = play(3 * CHECKPOINT_INTERVAL + 1)
+    doc = encode_game(game)
+    for ply in range(len(game.positions)):
+        assert position_at(doc, ply) == game.positions[ply]
+
+def test_position_at_uses_the_documents_interval(monkeypatch):
+    game = play(25)
+    monkeypatch.setattr(game_codec, "CHECKPOINT_INTERVAL", 4)
+    doc = encode_game(game)
+    monkeypatch.setattr(game_codec, "CHECKPOINT_INTERVAL", 10)
+
+    assert doc["checkpoint_interval"] == 4
+    assert len(doc["checkpoints"]) == 6
+    for ply in range(len(game.positions)):
+        assert position_at(doc, ply) == game.positions[ply]
+
+def test_position_at_checkpoints_from_appended_plies():
+    game = play(2 * CHECKPOINT_INTERVAL + 3)
+    doc = encode_game(play(0))
+
+    # Append in uneven batches, as the session store flushes them
+    start = 0
+    for size in (3, CHECKPOINT_INTERVAL - 1, 1, CHECKPOINT_INTERVAL + 2):
+        end = min(start + size, len(game.moves))
+        push = build_ply_update(start, game.moves[start:end], game.positions[start + 1:end + 1],
+                                game.analysis[start:end])["$push"]
+        doc["moves"] += push["moves"]["$each"]
+        doc["checkpoints"] += push.get("checkpoints", {}).get("$each", [])
+        start = end
+
+    assert doc["moves"] == game.moves
+    assert doc["checkpoints"] == game.positions[CHECKPOINT_INTERVAL::CHECKPOINT_INTERVAL]
+    for ply in range(len(game.positions)):
+        assert position_at(doc, ply) == game.positions[ply]
+
+def test_legacy_document():
+    game = play(5)
+    doc = game.dict()
+    assert position_at(doc, 3) == game.positions[3]
+    assert decode_game(doc).positions == game.positions
+
+def test_replay_positions_defaults_to_the_start_position():
+    assert replay_positions(None, []) == [chess.STARTING_FEN]
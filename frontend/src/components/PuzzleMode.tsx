@@ -76,9 +76,10 @@ export const PuzzleMode: React.FC<PuzzleModeProps> = ({ userId, userRating }) =>
     if (!currentPuzzle) return;
     
     try {
+      // Hints follow the puzzle's response tree, so send the id rather than the solution
       const hint = await chessTutorAPI.getHint(
-        currentPuzzle.fen,
-        currentPuzzle.solution,
+        currentPuzzle.puzzle_id,
+        [],
         hintLevel + 1
       );
       setHintLevel(hint.hint_level);
@@ -39,6 +39,16 @@ class ChessTutorAPI {
     return response.data;
   }
 
+  // Puzzles
+  async getHint(puzzleId: string, userMoves: string[], hintLevel: number) {
+    const response = await this.client.post('/puzzle/hint', {
+      puzzle_id: puzzleId,
+      user_moves: userMoves,
+      hint_level: hintLevel
+    });
+    return response.data;
+  }
+
   async getUserGames(userId: string) {
     const response = await this.client.get(`/game/user/${userId}`);
     return response.data.games;